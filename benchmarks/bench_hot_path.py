@@ -0,0 +1,277 @@
+"""Micro-benchmarks for the Phnix Heating status poll hot path.
+
+Each cycle runs the real code path for every device: PhnixAPI.get_device_status
+(request, JSON decode, plan-based snapshot decode) followed by the coordinator
+update callback of every sensor, binary sensor and climate entity. The cloud is
+replaced by an in-process session serving synthetic dataList payloads and state
+writes are counted instead of reaching a state machine, so results measure the
+integration's own cost only. CPU time and allocations are measured in separate
+passes, as tracing allocations slows the code it traces.
+
+The baseline gate fails only on deterministic metrics: the request count must
+not grow at all and peak allocations must stay within a tolerance. CPU time
+depends on the machine and its load, so it is reported but never gated.
+
+Requires Home Assistant to be installed, as the integration imports it:
+    pip install -r requirements_bench.txt
+
+Usage:
+    python benchmarks/bench_hot_path.py
+    python benchmarks/bench_hot_path.py --rows 300 10000 --devices 1 100
+    python benchmarks/bench_hot_path.py --save benchmarks/baseline.json
+    python benchmarks/bench_hot_path.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from custom_components.phnix_heating.binary_sensor import BINARY_SENSORS, PhnixBinarySensor
+from custom_components.phnix_heating.climate import PhnixClimate
+from custom_components.phnix_heating.const import (
+    COOL_TEMP_ADDRESS, DEFAULT_PROTOCOL_ID, HEAT_TEMP_ADDRESS
+)
+from custom_components.phnix_heating.decoder import build_decoder_plan
+from custom_components.phnix_heating.phnix_api import PhnixAPI, PhnixRequestOptions
+from custom_components.phnix_heating.sensor import SENSORS, PhnixSensor
+
+# 基准门禁只检查确定性指标；数值越大越差
+GATED_METRICS = ("requests", "alloc_kb")
+# 随机器和负载波动，只报告不判定
+REPORTED_METRICS = ("cpu_ms",)
+
+def build_data_list(rows: int) -> List[Dict[str, Any]]:
+    """Build a synthetic dataList with every register the integration reads."""
+    data_list = []
+    for sensor in SENSORS:
+        data_list.append({"address": sensor["address"], "num": "", "dataValue": "21.5"})
+    for sensor in BINARY_SENSORS:
+        data_list.append({
+            "address": sensor["address"],
+            "num": sensor.get("num", ""),
+            "dataValue": "1",
+        })
+    for address in (COOL_TEMP_ADDRESS, HEAT_TEMP_ADDRESS):
+        data_list.append({"address": address, "num": "", "dataValue": "26"})
+    
+    # 其余为集成不读取的寄存器
+    filler = 0
+    while len(data_list) < rows:
+        data_list.append({
+            "address": str(3000 + filler),
+            "num": "",
+            "dataValue": str(filler % 100),
+            "name": f"参数{filler}",
+            "unit": "",
+        })
+        filler += 1
+    return data_list
+
+class _FakeResponse:
+    """Minimal aiohttp response serving a prebuilt JSON body."""
+    
+    def __init__(self, body: bytes):
+        self.status = 200
+        self.headers = {"Content-Type": "application/json"}
+        self.raw_headers = ((b"Content-Type", b"application/json"),)
+        self.content_length = len(body)
+        self._body = body
+    
+    async def read(self) -> bytes:
+        return self._body
+    
+    async def json(self, **kwargs: Any) -> Any:
+        return json.loads(self._body)
+    
+    async def __aenter__(self) -> "_FakeResponse":
+        return self
+    
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+class FakeSession:
+    """In-process stand-in for the Phnix cloud that counts requests."""
+    
+    closed = False
+    
+    def __init__(self, status_body: bytes):
+        self.requests = 0
+        self._status_body = status_body
+        self._login_body = json.dumps(
+            {"isReusltSuc": True, "objectResult": {"x-token": "bench"}}
+        ).encode()
+        self._control_body = json.dumps({"isReusltSuc": True}).encode()
+    
+    def post(self, url: str, **kwargs: Any) -> _FakeResponse:
+        self.requests += 1
+        if url.endswith("/login"):
+            return _FakeResponse(self._login_body)
+        if "getControlDetailStatus" in url:
+            return _FakeResponse(self._status_body)
+        return _FakeResponse(self._control_body)
+    
+    async def close(self) -> None:
+        return None
+
+def build_entities(coordinator: Any, device_codes: List[str]) -> List[Any]:
+    """Create the integration's entities for every device."""
+    entities: List[Any] = []
+    for code in device_codes:
+        entities.extend(PhnixSensor(coordinator, code, c) for c in SENSORS)
+        entities.extend(PhnixBinarySensor(coordinator, code, c) for c in BINARY_SENSORS)
+        entities.append(PhnixClimate(coordinator, code))
+    for entity in entities:
+        # 没有状态机，只统计状态写入次数
+        entity.async_write_ha_state = coordinator.count_write
+    return entities
+
+async def run_scenario(rows: int, devices: int, cycles: int) -> Dict[str, float]:
+    """Run poll cycles for one payload size and device count."""
+    body = json.dumps({
+        "isReusltSuc": True,
+        "objectResult": {"dataList": build_data_list(rows)},
+    }).encode()
+    session = FakeSession(body)
+    device_codes = [f"BENCH{index:04d}" for index in range(devices)]
+    # 协议ID已缓存，与重启后从存储恢复的稳定状态一致
+    protocol_cache = {
+        code: {"protocol_id": DEFAULT_PROTOCOL_ID, "discovered_at": time.time()}
+        for code in device_codes
+    }
+    api = PhnixAPI(
+        "bench", "bench", device_codes[0], session=session, protocol_cache=protocol_cache
+    )
+    writes = [0]
+    coordinator = SimpleNamespace(
+        api=api,
+        config_entry=SimpleNamespace(entry_id="bench", data={"name": "bench"}),
+        device_codes=device_codes,
+        plan=build_decoder_plan(),
+        request_options=PhnixRequestOptions(),
+        data=None,
+        last_update_success=True,
+        restored_at=None,
+        count_write=lambda: writes.__setitem__(0, writes[0] + 1),
+    )
+    entities = build_entities(coordinator, device_codes)
+    await api.login()
+    
+    async def poll_cycle() -> None:
+        """Fetch every device, then notify every entity like the coordinator does."""
+        coordinator.data = {
+            code: await api.get_device_status(coordinator.plan, code, coordinator.request_options)
+            for code in device_codes
+        }
+        for entity in entities:
+            entity._handle_coordinator_update()
+    
+    cpu_ms: List[float] = []
+    requests: List[int] = []
+    for _ in range(cycles):
+        session.requests = 0
+        start = time.process_time()
+        await poll_cycle()
+        cpu_ms.append((time.process_time() - start) * 1000)
+        requests.append(session.requests)
+    
+    # 关闭循环垃圾回收，使峰值不受回收时机影响，结果可重复
+    alloc_kb: List[float] = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(cycles):
+            tracemalloc.start()
+            await poll_cycle()
+            alloc_kb.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+            gc.collect()
+    finally:
+        gc.enable()
+    
+    await api.close()
+    return {
+        "cpu_ms": statistics.median(cpu_ms),
+        "alloc_kb": statistics.median(alloc_kb),
+        "requests": statistics.median(requests),
+    }
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    alloc_tolerance: float,
+) -> Tuple[List[str], List[str]]:
+    """Compare results with a baseline.
+
+    Returns the gated regressions (any extra request, or allocations above the
+    tolerance) and a report line for every reported-only metric.
+    """
+    regressions = []
+    report = []
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in GATED_METRICS:
+            old, new = previous.get(metric), metrics[metric]
+            if old is None:
+                continue
+            tolerance = alloc_tolerance if metric == "alloc_kb" else 0.0
+            if new > old * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {old:.2f} -> {new:.2f}")
+        for metric in REPORTED_METRICS:
+            old, new = previous.get(metric), metrics[metric]
+            if old:
+                report.append(f"{name} {metric}: {old:.2f} -> {new:.2f} ({(new - old) / old:+.0%})")
+    return regressions, report
+
+def main() -> int:
+    """Run the benchmark matrix and optionally gate on a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[300, 2000, 10000])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--baseline", help="fail if results regress against this baseline")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.15,
+                        help="allowed relative growth of peak allocations (default 0.15)")
+    args = parser.parse_args()
+    
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'scenario':<24}{'cpu ms/cycle':>14}{'peak alloc KiB':>16}{'requests':>10}")
+    for rows in args.rows:
+        for devices in args.devices:
+            name = f"rows={rows},devices={devices}"
+            metrics = asyncio.run(run_scenario(rows, devices, args.cycles))
+            results[name] = metrics
+            print(f"{name:<24}{metrics['cpu_ms']:>14.2f}{metrics['alloc_kb']:>16.1f}"
+                  f"{metrics['requests']:>10.0f}")
+    
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions, report = compare(results, json.load(file), args.alloc_tolerance)
+        if report:
+            print("\nCPU time (not gated):")
+            for line in report:
+                print(f"  {line}")
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
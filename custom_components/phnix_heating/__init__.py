@@ -1,54 +1,176 @@
 """The Phnix Heating integration."""
 import logging
-from typing import Any
+from typing import Any, Dict, Optional
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.storage import Store
 
-from .const import DOMAIN, PLATFORMS
+from .const import (
+    DOMAIN, PLATFORMS, CLIENTS, PROTOCOLS, PROTOCOL_STORAGE_VERSION,
+    PROTOCOL_SAVE_DELAY
+)
+from .coordinator import PhnixDataUpdateCoordinator, async_remove_snapshot
+from .decoder import async_build_decoder_plan
 from .phnix_api import PhnixAPI, PhnixAPIError
 
 _LOGGER = logging.getLogger(__name__)
 
+class _ClientRef:
+    """A shared API client and the number of config entries using it."""
+    
+    __slots__ = ("api", "refcount")
+    
+    def __init__(self, api: PhnixAPI):
+        """Initialize the reference."""
+        self.api = api
+        self.refcount = 0
+
+class _ProtocolCache:
+    """Discovered device protocol IDs shared by all clients and persisted."""
+    
+    __slots__ = ("store", "data")
+    
+    def __init__(self, store: Store, data: Dict[str, Dict[str, Any]]):
+        """Initialize the cache."""
+        self.store = store
+        self.data = data
+    
+    @callback
+    def async_schedule_save(self) -> None:
+        """Persist the cache after a discovery."""
+        self.store.async_delay_save(lambda: self.data, PROTOCOL_SAVE_DELAY)
+
+async def _async_get_protocol_cache(hass: HomeAssistant) -> _ProtocolCache:
+    """Return the protocol ID cache, loading it from storage once."""
+    cache = hass.data[DOMAIN].get(PROTOCOLS)
+    if cache is not None:
+        return cache
+    
+    store = Store(hass, PROTOCOL_STORAGE_VERSION, f"{DOMAIN}.{PROTOCOLS}")
+    try:
+        data = await store.async_load() or {}
+    except Exception as ex:  # 存储损坏时忽略，重新发现
+        _LOGGER.warning("读取已缓存的协议ID失败: %s", ex)
+        data = {}
+    # 并发加载时以先完成者为准
+    return hass.data[DOMAIN].setdefault(PROTOCOLS, _ProtocolCache(store, data))
+
+@callback
+def async_get_shared_client(hass: HomeAssistant, username: str) -> Optional[PhnixAPI]:
+    """Return the account's shared API client if a loaded entry holds one."""
+    ref = hass.data.get(DOMAIN, {}).get(CLIENTS, {}).get(username)
+    return ref.api if ref is not None else None
+
+def _acquire_client(
+    hass: HomeAssistant, entry: ConfigEntry, protocols: _ProtocolCache
+) -> PhnixAPI:
+    """Return the account's shared API client, creating it if needed."""
+    clients: Dict[str, _ClientRef] = hass.data[DOMAIN].setdefault(CLIENTS, {})
+    username = entry.data["username"]
+    
+    ref = clients.get(username)
+    if ref is None:
+        ref = clients[username] = _ClientRef(
+            PhnixAPI(
+                username=username,
+                password=entry.data["password"],
+                device_code=entry.data["device_code"],
+                protocol_cache=protocols.data,
+            )
+        )
+        ref.api.protocol_listener = protocols.async_schedule_save
+    
+    ref.refcount += 1
+    return ref.api
+
+async def _async_release_client(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Release the account's shared API client, closing it when unused."""
+    clients: Dict[str, _ClientRef] = hass.data[DOMAIN].get(CLIENTS, {})
+    username = entry.data["username"]
+    
+    ref = clients.get(username)
+    if ref is None:
+        return
+    ref.refcount -= 1
+    if ref.refcount <= 0:
+        del clients[username]
+        await ref.api.close()
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Phnix Heating from a config entry."""
     hass.data.setdefault(DOMAIN, {})
     
-    # 获取配置数据
-    username = entry.data["username"]
-    password = entry.data["password"]
-    device_code = entry.data["device_code"]
-    
-    # 创建API客户端
-    api = PhnixAPI(username=username, password=password, device_code=device_code)
+    # 同一账户的配置项共享一个API客户端和token，所有客户端共享协议ID缓存
+    protocols = await _async_get_protocol_cache(hass)
+    api = _acquire_client(hass, entry, protocols)
     
     try:
-        # 测试登录和连接
-        await api.login()
-        await api.get_device_status()
+        if api.password != entry.data["password"]:
+            # 通常是某个配置项修改了密码，新密码登录成功后整个账户改用新密码
+            try:
+                await api.update_password(entry.data["password"])
+            except PhnixAPIError as ex:
+                raise ConfigEntryNotReady(
+                    f"账户 {api.username} 的密码与已加载的配置项不一致，新密码登录失败: {ex}"
+                ) from ex
+            _LOGGER.info("账户 %s 的密码已更新，共享客户端改用新密码", api.username)
         
-        # 存储API实例
-        hass.data[DOMAIN][entry.entry_id] = api
+        # 创建共享的状态协调器，所有实体共用一次轮询结果，按预编译的计划解码
+        coordinator = PhnixDataUpdateCoordinator(
+            hass, api, entry, async_build_decoder_plan(hass, entry)
+        )
+        
+        # 有最近保存的快照时直接用它初始化实体，启动不等待云端
+        restored = await coordinator.async_restore_snapshot()
+        if not restored:
+            # 首次刷新同时验证登录和连接，其结果直接作为实体的初始快照
+            await coordinator.async_config_entry_first_refresh()
+        
+        # 存储协调器实例
+        hass.data[DOMAIN][entry.entry_id] = coordinator
         
         # 设置平台
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
         
+        if restored:
+            # 首次实时刷新在后台进行，完成后替换恢复的快照
+            entry.async_create_background_task(
+                hass, coordinator.async_refresh(), f"{DOMAIN}_first_refresh"
+            )
+        
+        # 选项变更后重新加载以应用新的轮询间隔
+        entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+        
         return True
         
+    except ConfigEntryNotReady:
+        await _async_release_client(hass, entry)
+        raise
     except PhnixAPIError as ex:
+        await _async_release_client(hass, entry)
         _LOGGER.error("无法连接到Phnix设备: %s", ex)
         raise ConfigEntryNotReady from ex
     except Exception as ex:
+        await _async_release_client(hass, entry)
         _LOGGER.error("设置Phnix Heating时发生未知错误: %s", ex)
         return False
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        # 关闭API连接
-        api = hass.data[DOMAIN].pop(entry.entry_id)
-        await api.close()
+        # 释放共享的API客户端，最后一个配置项卸载时关闭连接
+        hass.data[DOMAIN].pop(entry.entry_id)
+        await _async_release_client(hass, entry)
     
-    return unload_ok 
\ No newline at end of file
+    return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the persisted snapshots of a removed config entry."""
+    await async_remove_snapshot(hass, entry.entry_id)
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
@@ -8,14 +8,18 @@ from homeassistant.components.binary_sensor import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
-from .phnix_api import PhnixAPI
+from .const import DOMAIN, BITMASK_REGISTERS
+from .coordinator import PhnixDataUpdateCoordinator
+from .entity import PhnixEntity
+from .snapshot import PhnixStatusSnapshot, to_bool
 
 _LOGGER = logging.getLogger(__name__)
 
 # 二进制传感器定义
+# 仅排查故障时有用的传感器标记为诊断实体并默认禁用（entity_category、enabled_default）
 BINARY_SENSORS = [
     # 设备状态
     {
@@ -100,6 +104,8 @@ BINARY_SENSORS = [
         "address": "2019",
         "num": "O09",
         "device_class": BinarySensorDeviceClass.RUNNING,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "frost_heat_output",
@@ -107,6 +113,8 @@ BINARY_SENSORS = [
         "address": "2019",
         "num": "O10",
         "device_class": BinarySensorDeviceClass.HEAT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "crankcase_heat_output",
@@ -114,6 +122,8 @@ BINARY_SENSORS = [
         "address": "2019",
         "num": "O11",
         "device_class": BinarySensorDeviceClass.HEAT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "water_supply_output",
@@ -121,6 +131,8 @@ BINARY_SENSORS = [
         "address": "2019",
         "num": "bit11",
         "device_class": BinarySensorDeviceClass.RUNNING,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "alarm_output",
@@ -179,6 +191,8 @@ BINARY_SENSORS = [
         "address": "2034",
         "num": "S06",
         "device_class": BinarySensorDeviceClass.RUNNING,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "emergency_switch",
@@ -195,67 +209,56 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Phnix Heating binary sensor platform."""
-    api = hass.data[DOMAIN][config_entry.entry_id]
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
     
     entities = []
-    for sensor_config in BINARY_SENSORS:
-        entities.append(PhnixBinarySensor(api, config_entry, sensor_config))
+    for device_code in coordinator.device_codes:
+        for sensor_config in BINARY_SENSORS:
+            entities.append(PhnixBinarySensor(coordinator, device_code, sensor_config))
     
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
-class PhnixBinarySensor(BinarySensorEntity):
+class PhnixBinarySensor(PhnixEntity, BinarySensorEntity):
     """Representation of a Phnix Heating binary sensor."""
     
-    _attr_has_entity_name = True
-    
-    def __init__(self, api: PhnixAPI, config_entry: ConfigEntry, sensor_config: dict):
+    def __init__(
+        self,
+        coordinator: PhnixDataUpdateCoordinator,
+        device_code: str,
+        sensor_config: dict,
+    ):
         """Initialize the binary sensor."""
-        self.api = api
-        self.config_entry = config_entry
+        super().__init__(coordinator, device_code, sensor_config["key"])
         self.sensor_config = sensor_config
+        address = sensor_config["address"]
+        bits = BITMASK_REGISTERS.get(address)
+        if bits is not None:
+            # 输出状态和安全开关从该地址的位图中按预先确定的位读取
+            self._slot = coordinator.plan.bitmask_slot(address)
+            self._bit: Optional[int] = bits[sensor_config["num"]]
+        else:
+            # 有num字段的传感器按(address, num)解码，否则使用该地址的第一行
+            self._slot = coordinator.plan.slot(address, sensor_config.get("num"), to_bool)
+            self._bit = None
         
         # 设置实体属性
-        self._attr_unique_id = f"{config_entry.entry_id}_{sensor_config['key']}"
         self._attr_name = sensor_config["name"]
         self._attr_device_class = sensor_config["device_class"]
+        self._attr_entity_category = sensor_config.get("entity_category")
+        self._attr_entity_registry_enabled_default = sensor_config.get("enabled_default", True)
         
         # 状态属性
         self._attr_is_on = False
-        self._attr_available = False
+        self._init_from_status()
     
-    async def async_update(self) -> None:
-        """Update the binary sensor state."""
-        try:
-            # 获取设备状态
-            status_data = await self.api.get_device_status()
-            
-            # 查找对应的数据
-            address = self.sensor_config["address"]
-            num = self.sensor_config.get("num")
-            
-            for item in status_data:
-                if item["address"] == address:
-                    if num:
-                        # 对于有num字段的传感器，需要匹配num
-                        if item.get("num") == num:
-                            value = item.get("dataValue")
-                            self._attr_is_on = value == "1" if value is not None else False
-                            break
-                    else:
-                        # 对于没有num字段的传感器，直接使用dataValue
-                        value = item.get("dataValue")
-                        self._attr_is_on = value == "1" if value is not None else False
-                        break
-            else:
-                self._attr_is_on = False
-            
-            self._attr_available = True
-            
-        except Exception as e:
-            error_msg = str(e)
-            # 如果是登录相关错误，记录为警告而不是错误，因为会自动重试
-            if "请重新登录" in error_msg or "登录" in error_msg:
-                _LOGGER.warning("Binary sensor %s 更新时遇到登录问题，将自动重试: %s", self._attr_name, error_msg)
-            else:
-                _LOGGER.error("Failed to update binary sensor %s: %s", self._attr_name, e)
-            self._attr_available = False 
\ No newline at end of file
+    def _update_from_status(self, snapshot: PhnixStatusSnapshot) -> bool:
+        """Update the binary sensor state from the shared status snapshot."""
+        value = snapshot.value(self._slot)
+        if self._bit is None:
+            is_on = value is True
+        else:
+            is_on = value is not None and bool(value >> self._bit & 1)
+        
+        changed = is_on != self._attr_is_on
+        self._attr_is_on = is_on
+        return changed
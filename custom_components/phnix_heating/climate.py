@@ -1,6 +1,8 @@
 """Climate platform for Phnix Heating integration."""
+import asyncio
 import logging
-from typing import Any, Optional
+import time
+from typing import Any, Dict, Optional, Tuple
 
 from homeassistant.components.climate import (
     ClimateEntity,
@@ -12,28 +14,48 @@ from homeassistant.const import (
     ATTR_TEMPERATURE,
     UnitOfTemperature,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MODE_COOL, MODE_HEAT, POWER_OFF, POWER_ON
+from .const import (
+    DOMAIN, MODE_COOL, MODE_HEAT, POWER_OFF, POWER_ON,
+    COOL_TEMP_ADDRESS, HEAT_TEMP_ADDRESS, WRITE_CONFIRM_WINDOW
+)
+from .coordinator import PhnixDataUpdateCoordinator
+from .entity import PhnixEntity
+from .snapshot import PhnixStatusSnapshot, to_float, to_raw
 
 _LOGGER = logging.getLogger(__name__)
 
+# 温控实体读取的寄存器及其解码方式
+CLIMATE_FIELDS = {
+    "power": ("2011", to_raw),  # 开关机状态
+    "mode": ("2012", to_raw),  # 运行模式
+    "current_temperature": ("2047", to_float),  # 室内温度
+    "cool_setpoint": (COOL_TEMP_ADDRESS, to_float),  # 制冷温度设定
+    "heat_setpoint": (HEAT_TEMP_ADDRESS, to_float),  # 制热温度设定
+}
+
+# 各模式的温度设定字段
+SETPOINT_FIELDS = {MODE_COOL: "cool_setpoint", MODE_HEAT: "heat_setpoint"}
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Phnix Heating climate platform."""
-    api = hass.data[DOMAIN][config_entry.entry_id]
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
     
-    async_add_entities([PhnixClimate(api, config_entry)], True)
+    async_add_entities(
+        PhnixClimate(coordinator, device_code)
+        for device_code in coordinator.device_codes
+    )
 
-class PhnixClimate(ClimateEntity):
+class PhnixClimate(PhnixEntity, ClimateEntity):
     """Representation of a Phnix Heating climate entity."""
     
-    _attr_has_entity_name = True
-    _attr_name = "地暖主机"
+    _attr_name = None
     _attr_temperature_unit = UnitOfTemperature.CELSIUS
     _attr_supported_features = (
         ClimateEntityFeature.TARGET_TEMPERATURE |
@@ -44,100 +66,124 @@ class PhnixClimate(ClimateEntity):
     _attr_min_temp = 5.0
     _attr_max_temp = 60.0
     
-    def __init__(self, api, config_entry: ConfigEntry):
+    def __init__(self, coordinator: PhnixDataUpdateCoordinator, device_code: str):
         """Initialize the climate entity."""
-        self.api = api
-        self.config_entry = config_entry
-        self._attr_unique_id = f"{config_entry.entry_id}_climate"
+        super().__init__(coordinator, device_code, "climate")
+        self.api = coordinator.api
+        self._options = coordinator.request_options
+        self._slots = {
+            name: coordinator.plan.slot(address, None, converter)
+            for name, (address, converter) in CLIMATE_FIELDS.items()
+        }
         
         # 状态属性
         self._attr_hvac_mode = HVACMode.OFF
         self._attr_target_temperature = None
         self._attr_current_temperature = None
-        self._attr_available = False
+        self._power_status: Optional[str] = None
+        self._mode_status: Optional[str] = None
+        self._setpoints: Dict[Optional[str], Optional[float]] = {}
+        # 字段名 -> (写入的值, 写入时间)，轮询确认或超过确认窗口前保持显示写入的值
+        self._optimistic: Dict[str, Tuple[Any, float]] = {}
+        self._init_from_status()
     
-    async def async_update(self) -> None:
-        """Update the climate state."""
-        try:
-            # 获取设备状态
-            status_data = await self.api.get_device_status()
-            
-            # 解析状态数据
-            self._parse_status_data(status_data)
-            
-            self._attr_available = True
-            
-        except Exception as e:
-            error_msg = str(e)
-            # 如果是登录相关错误，记录为警告而不是错误，因为会自动重试
-            if "请重新登录" in error_msg or "登录" in error_msg:
-                _LOGGER.warning("Climate 更新时遇到登录问题，将自动重试: %s", error_msg)
-            else:
-                _LOGGER.error("Failed to update climate state: %s", e)
-            self._attr_available = False
+    def _update_from_status(self, snapshot: PhnixStatusSnapshot) -> bool:
+        """Update the climate state from the shared status snapshot."""
+        previous = (
+            self._attr_hvac_mode,
+            self._attr_target_temperature,
+            self._attr_current_temperature,
+        )
+        self._parse_status_data(snapshot)
+        return previous != (
+            self._attr_hvac_mode,
+            self._attr_target_temperature,
+            self._attr_current_temperature,
+        )
     
-    def _parse_status_data(self, status_data: list) -> None:
-        """Parse status data to update climate attributes."""
-        power_status = None
-        mode_status = None
-        target_temp = None
-        current_temp = None
-        
-        for item in status_data:
-            address = item.get("address")
-            data_value = item.get("dataValue")
-            
-            if address == "2011":  # 开关机状态
-                power_status = data_value
-            elif address == "2012":  # 运行模式
-                mode_status = data_value
-            elif address == "2047":  # 室内温度
-                try:
-                    current_temp = float(data_value) if data_value else None
-                except (ValueError, TypeError):
-                    pass
-            elif address == "1158" and mode_status == MODE_COOL:  # 制冷温度设定
-                try:
-                    target_temp = float(data_value) if data_value else None
-                except (ValueError, TypeError):
-                    pass
-            elif address == "1159" and mode_status == MODE_HEAT:  # 制热温度设定
-                try:
-                    target_temp = float(data_value) if data_value else None
-                except (ValueError, TypeError):
-                    pass
-        
+    def _parse_status_data(self, snapshot: PhnixStatusSnapshot) -> None:
+        """Parse status snapshot to update climate attributes."""
+        slots = self._slots
+        self._power_status = self._pending_value("power", snapshot.value(slots["power"]))
+        self._mode_status = self._pending_value("mode", snapshot.value(slots["mode"]))
+        self._setpoints = {
+            mode: self._pending_value(field, snapshot.value(slots[field]))
+            for mode, field in SETPOINT_FIELDS.items()
+        }
+        self._attr_current_temperature = snapshot.value(slots["current_temperature"])
+        self._apply_state()
+    
+    def _apply_state(self) -> None:
+        """Derive HVAC mode and target temperature from the register values."""
         # 更新HVAC模式
-        if power_status == POWER_OFF:
+        if self._power_status == POWER_OFF:
             self._attr_hvac_mode = HVACMode.OFF
-        elif mode_status == MODE_COOL:
+        elif self._mode_status == MODE_COOL:
             self._attr_hvac_mode = HVACMode.COOL
-        elif mode_status == MODE_HEAT:
+        elif self._mode_status == MODE_HEAT:
             self._attr_hvac_mode = HVACMode.HEAT
         else:
             self._attr_hvac_mode = HVACMode.OFF
         
-        # 更新温度
-        self._attr_current_temperature = current_temp
-        self._attr_target_temperature = target_temp
+        # 更新目标温度
+        self._attr_target_temperature = self._setpoints.get(self._mode_status)
+    
+    def _pending_value(self, field: str, polled: Any) -> Any:
+        """Return a written value the poll has not confirmed yet, else the polled one.
+        
+        The device may take up to WRITE_CONFIRM_WINDOW seconds to apply a
+        write, so earlier polls showing the old value do not revert it.
+        """
+        pending = self._optimistic.get(field)
+        if pending is None:
+            return polled
+        value, written_at = pending
+        if polled == value or time.monotonic() - written_at >= WRITE_CONFIRM_WINDOW:
+            del self._optimistic[field]
+            return polled
+        return value
+    
+    @callback
+    def _apply_optimistic(
+        self,
+        power_status: Optional[str] = None,
+        mode_status: Optional[str] = None,
+        setpoint: Optional[float] = None,
+    ) -> None:
+        """Apply a successfully written value until a poll confirms it."""
+        self.coordinator.async_note_command()
+        written_at = time.monotonic()
+        if power_status is not None:
+            self._power_status = power_status
+            self._optimistic["power"] = (power_status, written_at)
+        if mode_status is not None:
+            self._mode_status = mode_status
+            self._optimistic["mode"] = (mode_status, written_at)
+        if setpoint is not None:
+            self._setpoints[self._mode_status] = setpoint
+            field = SETPOINT_FIELDS.get(self._mode_status)
+            if field is not None:
+                self._optimistic[field] = (setpoint, written_at)
+        self._apply_state()
+        self._async_write_state()
     
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Set new target hvac mode."""
         try:
             if hvac_mode == HVACMode.OFF:
-                await self.api.set_power(False)
+                await self.api.set_power(False, self._device_code, self._options)
+                self._apply_optimistic(power_status=POWER_OFF)
             else:
-                # 先开机
-                await self.api.set_power(True)
-                
-                # 设置模式
-                if hvac_mode == HVACMode.COOL:
-                    await self.api.set_mode("cool")
-                elif hvac_mode == HVACMode.HEAT:
-                    await self.api.set_mode("heat")
-            
-            # 立即更新状态
-            await self.async_update()
+                # 开机与设置模式是独立的寄存器，合并在同一窗口内并发发送
+                mode = "cool" if hvac_mode == HVACMode.COOL else "heat"
+                await asyncio.gather(
+                    self.api.set_power(True, self._device_code, self._options),
+                    self.api.set_mode(mode, self._device_code, self._options),
+                )
+                self._apply_optimistic(
+                    power_status=POWER_ON,
+                    mode_status=MODE_COOL if mode == "cool" else MODE_HEAT,
+                )
             
         except Exception as e:
             _LOGGER.error("Failed to set HVAC mode: %s", e)
@@ -152,12 +198,14 @@ class PhnixClimate(ClimateEntity):
             
             # 根据当前模式设置温度
             if self._attr_hvac_mode == HVACMode.COOL:
-                await self.api.set_temperature(temperature, "cool")
+                await self.api.set_temperature(temperature, "cool", self._device_code, self._options)
             elif self._attr_hvac_mode == HVACMode.HEAT:
-                await self.api.set_temperature(temperature, "heat")
+                await self.api.set_temperature(temperature, "heat", self._device_code, self._options)
+            else:
+                return
             
-            # 立即更新状态
-            await self.async_update()
+            # 设备只接受整数温度
+            self._apply_optimistic(setpoint=float(int(temperature)))
             
         except Exception as e:
             _LOGGER.error("Failed to set temperature: %s", e)
@@ -166,8 +214,8 @@ class PhnixClimate(ClimateEntity):
     async def async_turn_on(self) -> None:
         """Turn the entity on."""
         try:
-            await self.api.set_power(True)
-            await self.async_update()
+            await self.api.set_power(True, self._device_code, self._options)
+            self._apply_optimistic(power_status=POWER_ON)
         except Exception as e:
             _LOGGER.error("Failed to turn on: %s", e)
             raise
@@ -175,8 +223,8 @@ class PhnixClimate(ClimateEntity):
     async def async_turn_off(self) -> None:
         """Turn the entity off."""
         try:
-            await self.api.set_power(False)
-            await self.async_update()
+            await self.api.set_power(False, self._device_code, self._options)
+            self._apply_optimistic(power_status=POWER_OFF)
         except Exception as e:
             _LOGGER.error("Failed to turn off: %s", e)
-            raise 
\ No newline at end of file
+            raise
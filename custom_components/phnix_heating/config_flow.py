@@ -1,19 +1,37 @@
 """Config flow for Phnix Heating integration."""
 import logging
+import re
 import voluptuous as vol
 from typing import Any, Dict, Optional
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.const import CONF_NAME
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN, CONF_MIN_SCAN_INTERVAL, CONF_MAX_SCAN_INTERVAL,
+    DEFAULT_MIN_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL, CONF_DEVICE_CODES,
+    CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY, DEFAULT_NAME,
+    CONF_LOGIN_TIMEOUT, CONF_STATUS_TIMEOUT, CONF_CONTROL_TIMEOUT,
+    CONF_HEDGE_STATUS_READS, DEFAULT_LOGIN_TIMEOUT, DEFAULT_STATUS_TIMEOUT,
+    DEFAULT_CONTROL_TIMEOUT, DEFAULT_HEDGE_STATUS_READS
+)
+from . import async_get_shared_client
 from .phnix_api import PhnixAPI
 
 _LOGGER = logging.getLogger(__name__)
 
+def _parse_device_codes(value: str) -> list:
+    """Split a comma or whitespace separated list of device codes."""
+    codes = []
+    for code in re.split(r"[,，;；\s]+", value):
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
 class PhnixHeatingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Phnix Heating."""
 
@@ -26,26 +44,37 @@ class PhnixHeatingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
+            # 支持以逗号分隔填写多个设备编码
+            device_codes = _parse_device_codes(user_input["device_code"])
             try:
-                # 创建API客户端进行登录测试
-                api = PhnixAPI(
-                    username=user_input["username"],
-                    password=user_input["password"],
-                    device_code=user_input["device_code"]
-                )
+                if not device_codes:
+                    raise ValueError("未填写设备编码")
                 
-                # 测试登录
-                await api.login()
+                # 账户已有登录的客户端且密码一致时直接复用其token
+                api = async_get_shared_client(self.hass, user_input["username"])
+                if api is None or api.password != user_input["password"]:
+                    # 创建API客户端进行登录测试
+                    api = PhnixAPI(
+                        username=user_input["username"],
+                        password=user_input["password"],
+                        device_code=device_codes[0],
+                        session=async_get_clientsession(self.hass),
+                    )
+                    
+                    # 测试登录
+                    await api.login()
                 
                 # 测试设备连接
-                await api.get_device_status()
+                for device_code in device_codes:
+                    await api.get_device_status(device_code=device_code)
                 
                 # 创建配置项
                 config_data = {
                     "username": user_input["username"],
                     "password": user_input["password"],
-                    "device_code": user_input["device_code"],
-                    "name": user_input.get("name", "地暖主机")
+                    "device_code": device_codes[0],
+                    CONF_DEVICE_CODES: device_codes,
+                    "name": user_input.get("name", DEFAULT_NAME)
                 }
                 
                 return self.async_create_entry(
@@ -64,11 +93,74 @@ class PhnixHeatingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Required("username"): str,
                 vol.Required("password"): str,
                 vol.Required("device_code"): str,
-                vol.Optional("name", default="地暖主机"): str,
+                vol.Optional("name", default=DEFAULT_NAME): str,
             }),
             errors=errors,
         )
 
     async def async_step_import(self, import_info: Dict[str, Any]) -> FlowResult:
         """Handle import from configuration.yaml."""
-        return await self.async_step_user(import_info) 
\ No newline at end of file
+        return await self.async_step_user(import_info)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Get the options flow for this handler."""
+        return PhnixHeatingOptionsFlow(config_entry)
+
+class PhnixHeatingOptionsFlow(config_entries.OptionsFlow):
+    """Handle Phnix Heating options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self._entry = config_entry
+
+    async def async_step_init(
+        self, user_input: Optional[Dict[str, Any]] = None
+    ) -> FlowResult:
+        """Manage the polling options."""
+        errors = {}
+
+        if user_input is not None:
+            if user_input[CONF_MIN_SCAN_INTERVAL] > user_input[CONF_MAX_SCAN_INTERVAL]:
+                errors["base"] = "invalid_scan_interval"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self._entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Required(
+                    CONF_MIN_SCAN_INTERVAL,
+                    default=options.get(CONF_MIN_SCAN_INTERVAL, DEFAULT_MIN_SCAN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=3600)),
+                vol.Required(
+                    CONF_MAX_SCAN_INTERVAL,
+                    default=options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=3600)),
+                vol.Required(
+                    CONF_MAX_CONCURRENCY,
+                    default=options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+                vol.Required(
+                    CONF_LOGIN_TIMEOUT,
+                    default=options.get(CONF_LOGIN_TIMEOUT, DEFAULT_LOGIN_TIMEOUT),
+                ): vol.All(vol.Coerce(float), vol.Range(min=1, max=120)),
+                vol.Required(
+                    CONF_STATUS_TIMEOUT,
+                    default=options.get(CONF_STATUS_TIMEOUT, DEFAULT_STATUS_TIMEOUT),
+                ): vol.All(vol.Coerce(float), vol.Range(min=1, max=120)),
+                vol.Required(
+                    CONF_CONTROL_TIMEOUT,
+                    default=options.get(CONF_CONTROL_TIMEOUT, DEFAULT_CONTROL_TIMEOUT),
+                ): vol.All(vol.Coerce(float), vol.Range(min=1, max=120)),
+                vol.Required(
+                    CONF_HEDGE_STATUS_READS,
+                    default=options.get(CONF_HEDGE_STATUS_READS, DEFAULT_HEDGE_STATUS_READS),
+                ): bool,
+            }),
+            errors=errors,
+        )
@@ -1,9 +1,31 @@
 """Constants for the Phnix Heating integration."""
+from datetime import timedelta
+
 from homeassistant.const import Platform
 
 DOMAIN = "phnix_heating"
 PLATFORMS = [Platform.CLIMATE, Platform.SENSOR, Platform.BINARY_SENSOR]
 
+# hass.data[DOMAIN]中按账户共享的API客户端
+CLIENTS = "clients"
+
+# 状态轮询间隔（所有实体共享一次请求）
+SCAN_INTERVAL = timedelta(seconds=30)
+
+# 自适应轮询：压缩机运行或刚发送命令时加快，关机待机时放慢
+CONF_MIN_SCAN_INTERVAL = "min_scan_interval"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+DEFAULT_MIN_SCAN_INTERVAL = 15  # 秒
+DEFAULT_MAX_SCAN_INTERVAL = 300  # 秒
+COMMAND_BOOST_WINDOW = 120  # 秒，控制命令后保持快速轮询的时间
+
+# 多设备：同一配置项下的设备编码及并发轮询上限
+CONF_DEVICE_CODES = "device_codes"
+CONF_MAX_CONCURRENCY = "max_concurrency"
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_NAME = "地暖主机"
+MANUFACTURER = "Phnix"
+
 # API配置
 BASE_URL = "https://server.phnixsmart.com"
 LOGIN_URL = f"{BASE_URL}/crmservice/api/app/user/login"
@@ -11,25 +33,67 @@ CONTROL_URL = f"{BASE_URL}/crmservice/api/app/device/createDeviceControlConfigDa
 STATUS_URL = f"{BASE_URL}/crmservice/api/app/device/getControlDetailStatusByDeviceCode"
 CONFIG_URL = f"{BASE_URL}/crmservice/api/app/device/getControlParamConfigByDeviceCode"
 
-# 默认请求头
+# 连接池配置：请求都发往同一主机，保持少量长连接以复用TCP/TLS握手
+CONNECTOR_LIMIT = 10
+CONNECTOR_LIMIT_PER_HOST = 4
+DNS_CACHE_TTL = 300  # 秒
+KEEPALIVE_TIMEOUT = 60  # 秒，短于常见服务器（如nginx默认75秒）与NAT的空闲超时，避免复用已被对端关闭的连接
+
+# 熔断器：连续网络失败后快速失败，按指数退避（带抖动）探测恢复
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BASE_BACKOFF = 30  # 秒
+BREAKER_MAX_BACKOFF = 900  # 秒
+
+# 请求超时（秒），按操作类型分别配置
+CONF_LOGIN_TIMEOUT = "login_timeout"
+CONF_STATUS_TIMEOUT = "status_timeout"
+CONF_CONTROL_TIMEOUT = "control_timeout"
+DEFAULT_LOGIN_TIMEOUT = 15
+DEFAULT_STATUS_TIMEOUT = 20
+DEFAULT_CONTROL_TIMEOUT = 10
+
+# 对冲状态请求：首个请求超过历史p95延迟仍未返回时再发一个，取先返回者
+CONF_HEDGE_STATUS_READS = "hedge_status_reads"
+DEFAULT_HEDGE_STATUS_READS = False
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 10
+HEDGE_DEFAULT_DELAY = 3.0  # 秒，样本不足时使用
+HEDGE_MIN_DELAY = 0.5  # 秒
+LATENCY_SAMPLES = 100
+
+# 设备协议ID：按设备发现一次并缓存到存储中，协议不匹配时重新发现
+DEFAULT_PROTOCOL_ID = "1679324789907087360"
+PROTOCOLS = "protocols"
+PROTOCOL_STORAGE_VERSION = 1
+PROTOCOL_SAVE_DELAY = 10  # 秒
+PROTOCOL_CACHE_TTL = 30 * 86400  # 秒
+PROTOCOL_REDISCOVERY_INTERVAL = 3600  # 秒，两次因不匹配触发的重新发现之间的最短间隔
+
+# 超过该大小（字节）的响应在线程池中解析，避免阻塞事件循环
+JSON_EXECUTOR_THRESHOLD = 128 * 1024
+
+# 持久化最近一次状态快照，重启后实体立即有值，首次刷新在后台进行
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10  # 秒，合并连续轮询的写入
+SNAPSHOT_MAX_AGE = 6 * 3600  # 秒，超过该时间的快照不再恢复
+ATTR_SNAPSHOT_TIME = "snapshot_time"
+
+# 默认请求头：只保留服务端可能校验的字段，Accept-Encoding由客户端按可用的解压方式添加
 DEFAULT_HEADERS = {
     "Accept": "application/json, text/plain, */*",
-    "Accept-Language": "zh-CN,zh;q=0.9",
-    "Cache-Control": "no-cache",
-    "Connection": "keep-alive",
     "Content-Type": "application/json;charset=UTF-8",
     "Origin": "http://yun.phnixsmart.com",
-    "Pragma": "no-cache",
     "Referer": "http://yun.phnixsmart.com/",
-    "Sec-Fetch-Dest": "empty",
-    "Sec-Fetch-Mode": "cors",
-    "Sec-Fetch-Site": "cross-site",
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36",
-    "sec-ch-ua": '"Not)A;Brand";v="8", "Chromium";v="138", "Google Chrome";v="138"',
-    "sec-ch-ua-mobile": "?0",
-    "sec-ch-ua-platform": '"Windows"',
 }
 
+# 传感器发布过滤：即使数值在死区内，超过该时间（秒）也会发布一次
+SENSOR_MAX_AGE = 900
+
+# Token有效期管理
+TOKEN_REFRESH_MARGIN = 0.8  # 在有效期的80%时后台刷新
+MIN_TOKEN_LIFETIME = 300  # 秒，短于此值的失效视为被挤下线，不用于估算有效期
+
 # 登录请求参数
 LOGIN_DATA = {
     "loginSource": "Web",
@@ -42,12 +106,29 @@ MODE_ADDRESS = "1012"
 COOL_TEMP_ADDRESS = "1158"
 HEAT_TEMP_ADDRESS = "1159"
 
+# 控制地址对应的状态地址，用于判断写入值是否与当前值相同
+CONTROL_STATUS_ADDRESSES = {
+    POWER_ADDRESS: "2011",
+    MODE_ADDRESS: "2012",
+    COOL_TEMP_ADDRESS: COOL_TEMP_ADDRESS,
+    HEAT_TEMP_ADDRESS: HEAT_TEMP_ADDRESS,
+}
+
+# 控制写入合并
+WRITE_DEBOUNCE = 0.5  # 秒，窗口内对同一地址的多次写入只发送最后一个值
+WRITE_CONFIRM_WINDOW = 60  # 秒，写入后等待状态确认的时间，确认前不跳过对该地址的重复写入
+
 # 控制值
 POWER_OFF = "0"
 POWER_ON = "1"
 MODE_COOL = "0"
 MODE_HEAT = "1"
 
+# 状态地址 - 设备状态
+POWER_STATUS_ADDRESS = "2011"
+COMP_FREQ_ADDRESS = "2025"
+COMPRESSOR_OUTPUT_NUM = "O01"
+
 # 状态地址 - 温度传感器
 TEMP_SENSORS = {
     "inlet_water_temp": "2045",
@@ -133,4 +214,35 @@ SAFETY_NAMES = {
     "S05": "电加热干烧开",
     "S06": "模式输入",
     "S09": "应急开关",
+}
+
+# 输出状态与安全开关按位图解码：OXX为第XX个输出（从1开始），bitN直接为第N位
+OUTPUT_BITS = {
+    "O01": 0,
+    "O02": 1,
+    "O03": 2,
+    "O04": 3,
+    "O05": 4,
+    "O06": 5,
+    "O07": 6,
+    "O08": 7,
+    "O09": 8,
+    "O10": 9,
+    "O11": 10,
+    "bit11": 11,
+    "O13": 12,
+    "bit13": 13,
+    "bit14": 14,
+}
+SAFETY_BITS = {
+    "S01": 0,
+    "S03": 2,
+    "S04": 3,
+    "S05": 4,
+    "S06": 5,
+    "S09": 8,
+}
+BITMASK_REGISTERS = {
+    OUTPUT_ADDRESS: OUTPUT_BITS,
+    SAFETY_ADDRESS: SAFETY_BITS,
 } 
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""Data update coordinator for Phnix Heating integration."""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN, SCAN_INTERVAL, POWER_OFF, POWER_STATUS_ADDRESS, OUTPUT_ADDRESS,
+    COMP_FREQ_ADDRESS, COMPRESSOR_OUTPUT_NUM, CONF_MIN_SCAN_INTERVAL,
+    CONF_MAX_SCAN_INTERVAL, DEFAULT_MIN_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL,
+    COMMAND_BOOST_WINDOW, CONF_DEVICE_CODES, CONF_MAX_CONCURRENCY,
+    DEFAULT_MAX_CONCURRENCY, SNAPSHOT_STORAGE_VERSION, SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_MAX_AGE, CONF_LOGIN_TIMEOUT, CONF_STATUS_TIMEOUT, CONF_CONTROL_TIMEOUT,
+    CONF_HEDGE_STATUS_READS, DEFAULT_LOGIN_TIMEOUT, DEFAULT_STATUS_TIMEOUT,
+    DEFAULT_CONTROL_TIMEOUT, DEFAULT_HEDGE_STATUS_READS
+)
+from .metrics import PhnixAPIMetrics
+from .phnix_api import CircuitBreaker, PhnixAPI, PhnixAPIError, PhnixRequestOptions
+from .snapshot import DecoderPlan, PhnixStatusSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+def get_device_codes(config_entry: ConfigEntry) -> List[str]:
+    """Return the device codes managed by a config entry, primary first."""
+    return list(config_entry.data.get(CONF_DEVICE_CODES) or [config_entry.data["device_code"]])
+
+def _snapshot_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the storage holding a config entry's last status snapshots."""
+    return Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot")
+
+async def async_remove_snapshot(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete a config entry's persisted status snapshots."""
+    await _snapshot_store(hass, entry_id).async_remove()
+
+# 自适应轮询依赖的寄存器，解码计划中始终保留
+ACTIVITY_REGISTERS = (
+    (POWER_STATUS_ADDRESS, None),
+    (OUTPUT_ADDRESS, COMPRESSOR_OUTPUT_NUM),
+    (COMP_FREQ_ADDRESS, None),
+)
+
+class PhnixDataUpdateCoordinator(DataUpdateCoordinator[Dict[str, PhnixStatusSnapshot]]):
+    """Fetch the status of every device once per interval for all entities.
+    
+    Data maps each device code to its latest snapshot; devices whose fetch
+    failed are left out. The interval adapts to device activity: it shortens
+    while any compressor runs, its frequency changes or a command was just
+    sent, and lengthens while all units are powered off.
+    
+    Successful polls are persisted so that entities can start from the last
+    known state after a restart; restored_at holds the fetch time of such a
+    restored snapshot until the first live poll replaces it.
+    """
+    
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: PhnixAPI,
+        config_entry: ConfigEntry,
+        plan: DecoderPlan,
+    ):
+        """Initialize the coordinator.
+        
+        plan decodes every poll and must include ACTIVITY_REGISTERS.
+        """
+        self.min_interval = timedelta(
+            seconds=config_entry.options.get(CONF_MIN_SCAN_INTERVAL, DEFAULT_MIN_SCAN_INTERVAL)
+        )
+        self.max_interval = max(
+            self.min_interval,
+            timedelta(
+                seconds=config_entry.options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL)
+            ),
+        )
+        self.default_interval = min(max(SCAN_INTERVAL, self.min_interval), self.max_interval)
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN}_{config_entry.title}",
+            update_interval=self.default_interval,
+        )
+        self.api = api
+        self.config_entry = config_entry
+        self.plan = plan
+        self.device_codes = get_device_codes(config_entry)
+        self.max_concurrency = config_entry.options.get(
+            CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+        )
+        # 客户端按账户共享，超时与对冲设置随本配置项的每个请求传入，请求另计入本配置项的指标
+        self.metrics = PhnixAPIMetrics()
+        self.request_options = PhnixRequestOptions(
+            login_timeout=config_entry.options.get(CONF_LOGIN_TIMEOUT, DEFAULT_LOGIN_TIMEOUT),
+            status_timeout=config_entry.options.get(CONF_STATUS_TIMEOUT, DEFAULT_STATUS_TIMEOUT),
+            control_timeout=config_entry.options.get(
+                CONF_CONTROL_TIMEOUT, DEFAULT_CONTROL_TIMEOUT
+            ),
+            hedge_status_reads=config_entry.options.get(
+                CONF_HEDGE_STATUS_READS, DEFAULT_HEDGE_STATUS_READS
+            ),
+            metrics=self.metrics,
+        )
+        self.failed_devices: Set[str] = set()
+        self.restored_at: Optional[datetime] = None
+        self._command_at: Optional[float] = None
+        self._fetched_at: Optional[datetime] = None
+        self._store = _snapshot_store(hass, config_entry.entry_id)
+    
+    async def async_restore_snapshot(self) -> bool:
+        """Load the persisted snapshots as stale data; return True if restored."""
+        try:
+            stored = await self._store.async_load()
+        except Exception as ex:  # 存储损坏时忽略，按首次启动处理
+            _LOGGER.warning("读取已保存的状态快照失败: %s", ex)
+            return False
+        if not stored:
+            return False
+        
+        fetched_at = dt_util.parse_datetime(stored.get("fetched_at") or "")
+        if fetched_at is None:
+            return False
+        age = (dt_util.utcnow() - fetched_at).total_seconds()
+        if age > SNAPSHOT_MAX_AGE:
+            _LOGGER.debug("已保存的状态快照已过期（%.0f秒），不再恢复", age)
+            return False
+        
+        devices = stored.get("devices") or {}
+        data = {
+            device_code: PhnixStatusSnapshot.from_rows(devices[device_code], self.plan)
+            for device_code in self.device_codes
+            if device_code in devices
+        }
+        if not data:
+            return False
+        
+        self.data = data
+        self.restored_at = fetched_at
+        self._fetched_at = fetched_at
+        _LOGGER.debug("已恢复 %d 台设备的状态快照（%.0f秒前）", len(data), age)
+        return True
+    
+    @callback
+    def _snapshot_to_store(self) -> Dict[str, Any]:
+        """Return the latest snapshots in their storage format."""
+        return {
+            "fetched_at": self._fetched_at.isoformat() if self._fetched_at else None,
+            "devices": {
+                device_code: snapshot.as_rows()
+                for device_code, snapshot in (self.data or {}).items()
+            },
+        }
+    
+    @callback
+    def async_note_command(self) -> None:
+        """Poll quickly for a while after a control command was sent."""
+        self._command_at = time.monotonic()
+        if self.update_interval != self.min_interval:
+            self.update_interval = self.min_interval
+            self._schedule_refresh()
+    
+    def _next_interval(
+        self, snapshot: PhnixStatusSnapshot, previous: Optional[PhnixStatusSnapshot]
+    ) -> timedelta:
+        """Choose the next polling interval from device activity."""
+        if (
+            self._command_at is not None
+            and time.monotonic() - self._command_at < COMMAND_BOOST_WINDOW
+        ):
+            return self.min_interval
+        if snapshot.get(OUTPUT_ADDRESS, COMPRESSOR_OUTPUT_NUM) == "1":
+            return self.min_interval
+        if previous is not None and snapshot.get(COMP_FREQ_ADDRESS) != previous.get(
+            COMP_FREQ_ADDRESS
+        ):
+            return self.min_interval
+        if snapshot.get(POWER_STATUS_ADDRESS) == POWER_OFF:
+            return self.max_interval
+        return self.default_interval
+    
+    async def _async_update_data(self) -> Dict[str, PhnixStatusSnapshot]:
+        """Fetch the latest status snapshots from the cloud."""
+        if self.api.circuit_open:
+            # 熔断期间不发起请求，所有实体一次性变为不可用
+            raise UpdateFailed("Phnix云服务暂时不可用，等待重试")
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def _fetch(device_code: str) -> PhnixStatusSnapshot:
+            async with semaphore:
+                return await self.api.get_device_status(
+                    self.plan, device_code, self.request_options
+                )
+        
+        device_codes = self.device_codes
+        results: List[Any] = []
+        if self.api.circuit_state == CircuitBreaker.STATE_HALF_OPEN:
+            # 半开状态只放行一个探测请求，先单独轮询一台设备，恢复后再并发轮询其余设备
+            results = await asyncio.gather(_fetch(device_codes[0]), return_exceptions=True)
+            device_codes = device_codes[1:]
+        results += await asyncio.gather(
+            *(_fetch(device_code) for device_code in device_codes),
+            return_exceptions=True,
+        )
+        
+        data: Dict[str, PhnixStatusSnapshot] = {}
+        errors: Dict[str, PhnixAPIError] = {}
+        for device_code, result in zip(self.device_codes, results):
+            if isinstance(result, PhnixAPIError):
+                errors[device_code] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                data[device_code] = result
+        
+        self.failed_devices = set(errors)
+        if not data:
+            ex = next(iter(errors.values()))
+            raise UpdateFailed(f"获取设备状态失败: {ex}") from ex
+        for device_code, ex in errors.items():
+            _LOGGER.warning("获取设备 %s 状态失败: %s", device_code, ex)
+        
+        previous = self.data or {}
+        self.update_interval = min(
+            self._next_interval(snapshot, previous.get(device_code))
+            for device_code, snapshot in data.items()
+        )
+        
+        # 保存快照供重启后立即恢复，连续轮询的写入会合并
+        self.restored_at = None
+        self._fetched_at = dt_util.utcnow()
+        self._store.async_delay_save(self._snapshot_to_store, SNAPSHOT_SAVE_DELAY)
+        return data
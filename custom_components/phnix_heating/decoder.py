@@ -0,0 +1,80 @@
+"""Decoder plan compilation for Phnix Heating integration."""
+from typing import AbstractSet, Set
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .binary_sensor import BINARY_SENSORS
+from .climate import CLIMATE_FIELDS
+from .const import BITMASK_REGISTERS
+from .coordinator import ACTIVITY_REGISTERS, get_device_codes
+from .entity import unique_id_for
+from .phnix_api import add_control_registers
+from .sensor import SENSORS
+from .snapshot import DecoderPlan, to_bool, to_number
+
+@callback
+def async_disabled_keys(hass: HomeAssistant, config_entry: ConfigEntry) -> Set[str]:
+    """Return the entity keys that are disabled for every device.
+    
+    An entity is disabled if its registry entry is, or if it is not
+    registered yet and its descriptor disables it by default.
+    """
+    registry = er.async_get(hass)
+    enabled_by_id = {
+        registry_entry.unique_id: registry_entry.disabled_by is None
+        for registry_entry in er.async_entries_for_config_entry(registry, config_entry.entry_id)
+    }
+    
+    device_codes = get_device_codes(config_entry)
+    return {
+        sensor_config["key"]
+        for sensor_config in (*SENSORS, *BINARY_SENSORS)
+        if not any(
+            enabled_by_id.get(
+                unique_id_for(config_entry.entry_id, device_codes, device_code, sensor_config["key"]),
+                sensor_config.get("enabled_default", True),
+            )
+            for device_code in device_codes
+        )
+    }
+
+def build_decoder_plan(disabled_keys: AbstractSet[str] = frozenset()) -> DecoderPlan:
+    """Compile the entity tables into the plan that decodes every poll.
+    
+    Registers read only by the entities in disabled_keys are left out.
+    """
+    plan = add_control_registers(DecoderPlan())
+    for address, num in ACTIVITY_REGISTERS:
+        plan.add_register(address, num)
+    
+    for address, converter in CLIMATE_FIELDS.values():
+        plan.add_field(address, None, converter)
+    for sensor_config in SENSORS:
+        if sensor_config["key"] in disabled_keys:
+            continue
+        address = sensor_config["address"]
+        if sensor_config.get("bitmask"):
+            plan.add_bitmask(address, BITMASK_REGISTERS[address])
+        else:
+            plan.add_field(address, None, to_number)
+    for sensor_config in BINARY_SENSORS:
+        if sensor_config["key"] in disabled_keys:
+            continue
+        address = sensor_config["address"]
+        if address in BITMASK_REGISTERS:
+            # 同一地址的各位只解码一次
+            plan.add_bitmask(address, BITMASK_REGISTERS[address])
+        else:
+            plan.add_field(address, sensor_config.get("num"), to_bool)
+    
+    return plan
+
+@callback
+def async_build_decoder_plan(hass: HomeAssistant, config_entry: ConfigEntry) -> DecoderPlan:
+    """Compile the plan for a config entry, skipping disabled entities.
+    
+    Enabling an entity reloads the config entry, which compiles a new plan.
+    """
+    return build_decoder_plan(async_disabled_keys(hass, config_entry))
@@ -0,0 +1,51 @@
+"""Diagnostics support for Phnix Heating integration."""
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import PhnixDataUpdateCoordinator
+
+TO_REDACT = {"username", "password"}
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: PhnixDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    api = coordinator.api
+    
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "coordinator": {
+            "device_codes": coordinator.device_codes,
+            "failed_devices": sorted(coordinator.failed_devices),
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": (
+                coordinator.update_interval.total_seconds()
+                if coordinator.update_interval else None
+            ),
+            "decoded_addresses": sorted(coordinator.plan.addresses),
+            "hedge_status_reads": coordinator.request_options.hedge_status_reads,
+            "metrics": coordinator.metrics.as_dict(),
+            "snapshot_rows": {
+                device_code: len(snapshot)
+                for device_code, snapshot in (coordinator.data or {}).items()
+            },
+        },
+        "api": {
+            "circuit_state": api.circuit_state,
+            "token_lifetime": api.token_lifetime,
+            "protocols": {
+                device_code: api.protocol_cache.get(device_code)
+                for device_code in coordinator.device_codes
+            },
+            # 同一账户的所有配置项共享客户端，此处为整个账户的指标
+            "account_metrics": api.metrics.as_dict(),
+        },
+    }
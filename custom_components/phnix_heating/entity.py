@@ -0,0 +1,101 @@
+"""Base entity for Phnix Heating integration."""
+from typing import Any, Dict, Optional, Sequence
+
+from homeassistant.core import callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN, DEFAULT_NAME, MANUFACTURER, ATTR_SNAPSHOT_TIME
+from .coordinator import PhnixDataUpdateCoordinator
+from .snapshot import PhnixStatusSnapshot
+
+def unique_id_for(
+    entry_id: str, device_codes: Sequence[str], device_code: str, key: str
+) -> str:
+    """Return the unique_id of an entity of a config entry's device."""
+    if device_code == device_codes[0]:
+        # 主设备沿用原有的unique_id，保证已注册的实体不变
+        return f"{entry_id}_{key}"
+    return f"{entry_id}_{device_code}_{key}"
+
+class PhnixEntity(CoordinatorEntity[PhnixDataUpdateCoordinator]):
+    """Coordinator entity bound to one device that only writes changed state."""
+    
+    _attr_has_entity_name = True
+    
+    def __init__(
+        self,
+        coordinator: PhnixDataUpdateCoordinator,
+        device_code: str,
+        key: str,
+    ):
+        """Initialize the entity."""
+        super().__init__(coordinator)
+        self._device_code = device_code
+        self._written_available: Optional[bool] = None
+        self._written_stale: Optional[bool] = None
+        
+        config_entry = coordinator.config_entry
+        name = config_entry.data.get("name", DEFAULT_NAME)
+        self._attr_unique_id = unique_id_for(
+            config_entry.entry_id, coordinator.device_codes, device_code, key
+        )
+        if device_code != coordinator.device_codes[0]:
+            name = f"{name} {device_code}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_code)},
+            name=name,
+            manufacturer=MANUFACTURER,
+        )
+    
+    @property
+    def snapshot(self) -> Optional[PhnixStatusSnapshot]:
+        """Return the latest snapshot of this entity's device."""
+        if self.coordinator.data is None:
+            return None
+        return self.coordinator.data.get(self._device_code)
+    
+    @property
+    def available(self) -> bool:
+        """Return True if the latest poll of this entity's device succeeded."""
+        return super().available and self.snapshot is not None
+    
+    @property
+    def extra_state_attributes(self) -> Optional[Dict[str, Any]]:
+        """Return the fetch time of a restored snapshot while it is shown."""
+        restored_at = self.coordinator.restored_at
+        if restored_at is None:
+            return None
+        return {ATTR_SNAPSHOT_TIME: restored_at.isoformat()}
+    
+    def _init_from_status(self) -> None:
+        """Populate the initial state from the coordinator's current snapshot."""
+        snapshot = self.snapshot
+        if snapshot is not None:
+            self._update_from_status(snapshot)
+    
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if the decoded value, availability or staleness changed."""
+        changed = False
+        snapshot = self.snapshot
+        if snapshot is not None:
+            changed = self._update_from_status(snapshot)
+        
+        if (
+            changed
+            or self.available != self._written_available
+            or (self.coordinator.restored_at is not None) != self._written_stale
+        ):
+            self._async_write_state()
+    
+    @callback
+    def _async_write_state(self) -> None:
+        """Write the state and remember the availability and staleness written."""
+        self._written_available = self.available
+        self._written_stale = self.coordinator.restored_at is not None
+        self.async_write_ha_state()
+    
+    def _update_from_status(self, snapshot: PhnixStatusSnapshot) -> bool:
+        """Update the entity from a snapshot; return True if its state changed."""
+        raise NotImplementedError
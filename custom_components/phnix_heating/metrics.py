@@ -0,0 +1,160 @@
+"""Request metrics for Phnix Heating integration."""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# 延迟直方图的桶上界（秒），最后一个桶统计超过所有上界的请求
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ENDPOINT_LOGIN = "login"
+ENDPOINT_STATUS = "status"
+ENDPOINT_CONTROL = "control"
+ENDPOINT_CONFIG = "config"
+
+class EndpointMetrics:
+    """Counters and a latency histogram for one API endpoint.
+    
+    bytes_sent and bytes_received approximate the traffic on the wire:
+    headers plus the body as transferred, i.e. compressed if the server
+    compressed it. bytes_decoded counts response bodies after
+    decompression.
+    """
+    
+    __slots__ = (
+        "requests", "failures", "retries", "bytes_sent", "bytes_received",
+        "bytes_decoded", "latency_sum", "latency_max", "latency_buckets",
+    )
+    
+    def __init__(self):
+        """Initialize empty metrics."""
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+    
+    def record(
+        self,
+        latency: float,
+        success: bool,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        bytes_decoded: int = 0,
+    ) -> None:
+        """Record one completed or failed request."""
+        self.requests += 1
+        if not success:
+            self.failures += 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.bytes_decoded += bytes_decoded
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_buckets[index] += 1
+                return
+        self.latency_buckets[-1] += 1
+    
+    @property
+    def average_latency(self) -> Optional[float]:
+        """Return the mean latency in seconds."""
+        if not self.requests:
+            return None
+        return self.latency_sum / self.requests
+    
+    def latency_quantile(self, quantile: float) -> Optional[float]:
+        """Return an upper bound for the latency quantile from the histogram."""
+        if not self.requests:
+            return None
+        target = quantile * self.requests
+        seen = 0
+        for index, count in enumerate(self.latency_buckets):
+            seen += count
+            if seen >= target:
+                if index < len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[index]
+                break
+        return self.latency_max
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the metrics as a JSON-serializable dict."""
+        buckets = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)}
+        buckets["inf"] = self.latency_buckets[-1]
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "bytes_decoded": self.bytes_decoded,
+            "latency_avg": self.average_latency,
+            "latency_p95": self.latency_quantile(0.95),
+            "latency_max": self.latency_max,
+            "latency_buckets": buckets,
+        }
+
+class PhnixAPIMetrics:
+    """Health metrics of a PhnixAPI client or of one config entry's requests."""
+    
+    def __init__(self):
+        """Initialize empty metrics."""
+        self.endpoints: Dict[str, EndpointMetrics] = {
+            name: EndpointMetrics()
+            for name in (ENDPOINT_LOGIN, ENDPOINT_STATUS, ENDPOINT_CONTROL, ENDPOINT_CONFIG)
+        }
+        self.token_refreshes = 0
+        self.hedged_requests = 0
+        self.last_successful_poll: Optional[datetime] = None
+    
+    @property
+    def requests(self) -> int:
+        """Return the number of requests sent to all endpoints."""
+        return sum(endpoint.requests for endpoint in self.endpoints.values())
+    
+    @property
+    def failures(self) -> int:
+        """Return the number of failed requests on all endpoints."""
+        return sum(endpoint.failures for endpoint in self.endpoints.values())
+    
+    @property
+    def retries(self) -> int:
+        """Return the number of retried requests on all endpoints."""
+        return sum(endpoint.retries for endpoint in self.endpoints.values())
+    
+    @property
+    def bytes_sent(self) -> int:
+        """Return the number of request bytes sent to all endpoints."""
+        return sum(endpoint.bytes_sent for endpoint in self.endpoints.values())
+    
+    @property
+    def bytes_received(self) -> int:
+        """Return the number of response bytes received from all endpoints."""
+        return sum(endpoint.bytes_received for endpoint in self.endpoints.values())
+    
+    @property
+    def bytes_decoded(self) -> int:
+        """Return the size of all response bodies after decompression."""
+        return sum(endpoint.bytes_decoded for endpoint in self.endpoints.values())
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the metrics as a JSON-serializable dict."""
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "bytes_decoded": self.bytes_decoded,
+            "logins": self.endpoints[ENDPOINT_LOGIN].requests,
+            "token_refreshes": self.token_refreshes,
+            "hedged_requests": self.hedged_requests,
+            "last_successful_poll": (
+                self.last_successful_poll.isoformat() if self.last_successful_poll else None
+            ),
+            "endpoints": {name: endpoint.as_dict() for name, endpoint in self.endpoints.items()},
+        }
@@ -1,49 +1,395 @@
 """API client for Phnix Heating system."""
+import asyncio
+import contextlib
 import logging
 import hashlib
+import importlib.util
+import json
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
 import aiohttp
-from typing import Any, Dict, List, Optional
+from typing import (
+    Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set,
+    AsyncIterator, Tuple, TypeVar
+)
+
+try:
+    import orjson
+except ImportError:  # Home Assistant自带orjson，独立使用时退回标准库
+    orjson = None
 
 from .const import (
     LOGIN_URL, CONTROL_URL, STATUS_URL, CONFIG_URL,
     DEFAULT_HEADERS, LOGIN_DATA, POWER_ADDRESS, MODE_ADDRESS,
     COOL_TEMP_ADDRESS, HEAT_TEMP_ADDRESS, POWER_OFF, POWER_ON,
-    MODE_COOL, MODE_HEAT
+    MODE_COOL, MODE_HEAT, TOKEN_REFRESH_MARGIN, MIN_TOKEN_LIFETIME,
+    CONNECTOR_LIMIT, CONNECTOR_LIMIT_PER_HOST, DNS_CACHE_TTL, KEEPALIVE_TIMEOUT,
+    CONTROL_STATUS_ADDRESSES, WRITE_DEBOUNCE, WRITE_CONFIRM_WINDOW,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_BASE_BACKOFF, BREAKER_MAX_BACKOFF,
+    DEFAULT_LOGIN_TIMEOUT, DEFAULT_STATUS_TIMEOUT, DEFAULT_CONTROL_TIMEOUT,
+    DEFAULT_HEDGE_STATUS_READS, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES,
+    HEDGE_DEFAULT_DELAY, HEDGE_MIN_DELAY, LATENCY_SAMPLES, DEFAULT_PROTOCOL_ID,
+    PROTOCOL_CACHE_TTL, PROTOCOL_REDISCOVERY_INTERVAL, JSON_EXECUTOR_THRESHOLD
+)
+from .metrics import (
+    ENDPOINT_CONFIG, ENDPOINT_CONTROL, ENDPOINT_LOGIN, ENDPOINT_STATUS,
+    PhnixAPIMetrics
 )
+from .snapshot import DecoderPlan, PhnixStatusSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
+_ENDPOINTS = {
+    LOGIN_URL: ENDPOINT_LOGIN,
+    STATUS_URL: ENDPOINT_STATUS,
+    CONTROL_URL: ENDPOINT_CONTROL,
+    CONFIG_URL: ENDPOINT_CONFIG,
+}
+
+_json_loads: Callable[[bytes], Any] = orjson.loads if orjson is not None else json.loads
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize a request body compactly."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+# aiohttp可自动解压gzip/deflate，安装了brotli时也能解压br
+_ACCEPT_ENCODING = "gzip, deflate" + (
+    ", br"
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi")
+    else ""
+)
+_REQUEST_HEADERS = {**DEFAULT_HEADERS, "Accept-Encoding": _ACCEPT_ENCODING}
+
+def _headers_size(headers: Iterable[Tuple[Any, Any]]) -> int:
+    """Approximate the encoded size of header lines ("name: value\r\n")."""
+    return sum(len(name) + len(value) + 4 for name, value in headers)
+
+def _decode_status(body: bytes) -> Any:
+    """Decode a status response, reducing each row to (address, num, dataValue).
+    
+    The rows carry names, units and ranges the integration never reads;
+    projecting them right after parsing lets the row dicts be freed in the
+    thread that parsed them instead of being handed to the event loop.
+    """
+    result = _json_loads(body)
+    object_result = result.get("objectResult") if isinstance(result, dict) else None
+    if isinstance(object_result, dict) and object_result.get("dataList"):
+        object_result["dataList"] = [
+            (item.get("address"), item.get("num"), item.get("dataValue"))
+            for item in object_result["dataList"]
+        ]
+    return result
+
+# 各接口的响应解析函数，状态响应解析时即丢弃用不到的字段
+_DECODERS: Dict[str, Callable[[bytes], Any]] = {
+    STATUS_URL: _decode_status,
+}
+
 class PhnixAPIError(Exception):
     """Exception raised for Phnix API errors."""
     pass
 
+class PhnixAuthError(PhnixAPIError):
+    """Exception raised when the server rejects the current token."""
+    pass
+
+class PhnixCircuitOpenError(PhnixAPIError):
+    """Exception raised without network I/O while the circuit breaker is open."""
+    pass
+
+def _is_auth_error_message(error_msg: str) -> bool:
+    """Return True if an error message asks the client to log in again."""
+    return "请重新登录" in error_msg or "token" in error_msg.lower() or "登录" in error_msg
+
+def _is_protocol_mismatch(result: Dict[str, Any], expect_rows: bool) -> bool:
+    """Return True if a response suggests the request used the wrong protocol ID.
+    
+    A failed response whose message mentions the protocol always counts.
+    When expect_rows is set, a successful response without any status rows
+    counts too, as units queried with another model's protocol return an
+    empty dataList.
+    """
+    if not result.get("isReusltSuc"):
+        error_msg = result.get("error_msg") or ""
+        return "协议" in error_msg or "protoc" in error_msg.lower()
+    if expect_rows:
+        object_result = result.get("objectResult") or {}
+        return not object_result.get("dataList")
+    return False
+
+def _find_protocol_id(object_result: Any) -> Optional[str]:
+    """Return the protocol ID carried by a config response, if any."""
+    if not isinstance(object_result, dict):
+        return None
+    # 服务端字段拼写为protocalId，同时兼容正确拼写
+    for item in (object_result, *(object_result.get("dataList") or ())):
+        if not isinstance(item, dict):
+            continue
+        for key in ("protocalId", "protocolId"):
+            value = item.get(key)
+            if value:
+                return str(value)
+    return None
+
+def add_control_registers(plan: DecoderPlan) -> DecoderPlan:
+    """Keep the status registers used to skip redundant control writes."""
+    for status_address in CONTROL_STATUS_ADDRESSES.values():
+        plan.add_register(status_address)
+    return plan
+
+_CONTROL_PLAN = add_control_registers(DecoderPlan())
+
+def _same_value(current: Optional[str], value: str) -> bool:
+    """Return True if a register already holds the value to be written."""
+    if current is None:
+        return False
+    try:
+        return float(current) == float(value)
+    except (ValueError, TypeError):
+        return current == value
+
+def _consume_result(future: asyncio.Future) -> None:
+    """Mark a write result as retrieved when no caller is left to await it."""
+    if not future.cancelled():
+        future.exception()
+
+class CircuitBreaker:
+    """Fail fast after repeated network failures and probe with backoff.
+    
+    After failure_threshold consecutive failures the breaker opens and
+    requests fail immediately. Once the backoff delay has passed a single
+    probe request is let through; success closes the breaker, failure
+    reopens it with twice the backoff, up to max_backoff.
+    """
+    
+    STATE_CLOSED = "closed"
+    STATE_OPEN = "open"
+    STATE_HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_backoff: float = BREAKER_BASE_BACKOFF,
+        max_backoff: float = BREAKER_MAX_BACKOFF,
+    ):
+        """Initialize the breaker in the closed state."""
+        self._failure_threshold = failure_threshold
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._failures = 0
+        self._open_count = 0
+        self._retry_at: Optional[float] = None
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        """Return the current breaker state."""
+        if self._retry_at is None:
+            return self.STATE_CLOSED
+        if self._probing or time.monotonic() >= self._retry_at:
+            return self.STATE_HALF_OPEN
+        return self.STATE_OPEN
+    
+    def before_request(self) -> None:
+        """Raise PhnixCircuitOpenError unless a request may be sent now."""
+        if self._retry_at is None:
+            return
+        remaining = self._retry_at - time.monotonic()
+        if self._probing or remaining > 0:
+            raise PhnixCircuitOpenError(
+                f"Phnix云服务暂时不可用，{max(remaining, 0):.0f}秒后重试"
+            )
+        self._probing = True
+    
+    def record_success(self) -> None:
+        """Close the breaker after the server answered."""
+        if self._retry_at is not None:
+            _LOGGER.info("Phnix云服务已恢复")
+        self._failures = 0
+        self._open_count = 0
+        self._retry_at = None
+        self._probing = False
+    
+    def record_failure(self) -> None:
+        """Count a network failure, opening the breaker at the threshold."""
+        self._failures += 1
+        if (
+            not self._probing
+            and self._retry_at is None
+            and self._failures < self._failure_threshold
+        ):
+            return
+        
+        self._probing = False
+        self._open_count += 1
+        backoff = min(self._max_backoff, self._base_backoff * 2 ** (self._open_count - 1))
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        self._retry_at = time.monotonic() + delay
+        _LOGGER.warning("Phnix云服务连续请求失败，暂停请求 %.0f 秒", delay)
+    
+    def release_probe(self) -> None:
+        """Allow a new probe when the current one ended without a result."""
+        self._probing = False
+
+class PhnixRequestOptions:
+    """Per-operation deadlines in seconds and status read hedging.
+    
+    A client shared by several config entries takes each entry's options
+    with its requests, so one entry's settings never apply to another's.
+    Requests are also recorded in metrics, if set, besides the client's
+    own account-wide metrics.
+    """
+    
+    __slots__ = (
+        "login_timeout", "status_timeout", "control_timeout", "hedge_status_reads",
+        "metrics"
+    )
+    
+    def __init__(
+        self,
+        login_timeout: float = DEFAULT_LOGIN_TIMEOUT,
+        status_timeout: float = DEFAULT_STATUS_TIMEOUT,
+        control_timeout: float = DEFAULT_CONTROL_TIMEOUT,
+        hedge_status_reads: bool = DEFAULT_HEDGE_STATUS_READS,
+        metrics: Optional[PhnixAPIMetrics] = None,
+    ):
+        """Initialize the options."""
+        self.login_timeout = login_timeout
+        self.status_timeout = status_timeout
+        self.control_timeout = control_timeout
+        self.hedge_status_reads = hedge_status_reads
+        self.metrics = metrics
+
+class _PendingWrite:
+    """A control write waiting for the debounce window to close."""
+    
+    __slots__ = ("value", "description", "options", "future")
+    
+    def __init__(self, future: asyncio.Future):
+        """Initialize the pending write."""
+        self.value = ""
+        self.description = ""
+        self.options: Optional[PhnixRequestOptions] = None
+        self.future = future
+        future.add_done_callback(_consume_result)
+
 class PhnixAPI:
     """Phnix Heating API client."""
     
-    def __init__(self, username: str, password: str, device_code: str):
-        """Initialize the API client."""
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        device_code: str,
+        token_lifetime: Optional[float] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        protocol_cache: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        """Initialize the API client.
+        
+        token_lifetime is an optional initial estimate in seconds. Without
+        it the lifetime is learned from observed token expiries.
+        An injected session is used as-is and never closed by the client;
+        otherwise the client creates and owns a session tuned for the
+        Phnix cloud. protocol_cache maps device codes to their discovered
+        protocol IDs; the client updates it in place and calls
+        protocol_listener afterwards so that the owner can persist it.
+        Requests made without PhnixRequestOptions use options.
+        """
         self.username = username
         self.password = password
         self.device_code = device_code
         self.token: Optional[str] = None
-        self.session: Optional[aiohttp.ClientSession] = None
-        self._protocol_id: Optional[str] = None
+        self.session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+        self.protocol_cache: Dict[str, Dict[str, Any]] = (
+            protocol_cache if protocol_cache is not None else {}
+        )
+        self.protocol_listener: Optional[Callable[[], None]] = None
+        self._protocol_lock = asyncio.Lock()
+        self._login_lock = asyncio.Lock()
+        self._breaker = CircuitBreaker()
+        self.options = PhnixRequestOptions()
+        self._status_latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.metrics = PhnixAPIMetrics()
+        self._token_issued_at: Optional[float] = None
+        self._token_lifetime: Optional[float] = token_lifetime
+        self._expiry_sample: Optional[float] = None
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # 仅保存经状态轮询确认的值，用于跳过无变化的写入
+        self._register_values: Dict[Tuple[str, str], str] = {}
+        self._unconfirmed_writes: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._pending_writes: Dict[Tuple[str, str], _PendingWrite] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._write_tasks: Set[asyncio.Task] = set()
         
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session."""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit=CONNECTOR_LIMIT,
+                limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True,
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
         return self.session
     
+    def _metrics_for(
+        self, options: Optional[PhnixRequestOptions]
+    ) -> Tuple[PhnixAPIMetrics, ...]:
+        """Return the client's metrics and those of the entry a request is for."""
+        if options is None or options.metrics is None:
+            return (self.metrics,)
+        return (self.metrics, options.metrics)
+    
+    @contextlib.asynccontextmanager
+    async def _deadline(
+        self,
+        seconds: float,
+        endpoint: str,
+        description: str,
+        options: PhnixRequestOptions,
+    ) -> AsyncIterator[None]:
+        """Bound a whole operation, including re-login and retries, by one deadline.
+        
+        When the deadline rather than an attempt's own timeout ends a stalled
+        request, the request is cancelled without being counted, so the
+        failure is recorded here for the endpoint and the circuit breaker.
+        """
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(seconds):
+                yield
+        except TimeoutError:
+            for metrics in self._metrics_for(options):
+                metrics.endpoints[endpoint].record(time.monotonic() - start, False)
+            self._breaker.record_failure()
+            raise PhnixAPIError(f"{description}超时（{seconds}秒）") from None
+    
     def _hash_password(self, password: str) -> str:
         """Hash password using MD5."""
         return hashlib.md5(password.encode()).hexdigest()
     
-    async def login(self) -> None:
-        """Login and get token."""
+    async def login(self, options: Optional[PhnixRequestOptions] = None) -> None:
+        """Login and get token within the login deadline."""
+        options = options or self.options
+        timeout = options.login_timeout
+        async with self._deadline(timeout, ENDPOINT_LOGIN, "登录", options):
+            await self._login(timeout, options)
+    
+    async def _login(self, timeout: float, options: PhnixRequestOptions) -> None:
+        """Send the login request and store the token."""
         try:
-            session = await self._get_session()
-            
             # 准备登录数据
             login_data = {
                 **LOGIN_DATA,
@@ -53,189 +399,658 @@ class PhnixAPI:
             
             _LOGGER.debug("正在登录...")
             
-            async with session.post(
-                LOGIN_URL,
-                headers=DEFAULT_HEADERS,
-                json=login_data
-            ) as response:
-                if response.status != 200:
-                    raise PhnixAPIError(f"登录失败，HTTP状态码: {response.status}")
-                
-                data = await response.json()
-                
-                if not data.get("isReusltSuc"):
-                    error_msg = data.get("error_msg", "未知错误")
-                    raise PhnixAPIError(f"登录失败: {error_msg}")
-                
-                # 获取token
-                object_result = data.get("objectResult", {})
-                self.token = object_result.get("x-token")
-                
-                if not self.token:
-                    raise PhnixAPIError("登录成功但未获取到token")
-                
-                _LOGGER.debug("登录成功，获取到token")
-                
+            status, data = await self._request_json(
+                LOGIN_URL, _REQUEST_HEADERS, login_data, timeout, options
+            )
+            if status != 200:
+                raise PhnixAPIError(f"登录失败，HTTP状态码: {status}")
+            
+            if not data.get("isReusltSuc"):
+                error_msg = data.get("error_msg", "未知错误")
+                raise PhnixAPIError(f"登录失败: {error_msg}")
+            
+            # 获取token
+            object_result = data.get("objectResult", {})
+            self.token = object_result.get("x-token")
+            
+            if not self.token:
+                raise PhnixAPIError("登录成功但未获取到token")
+            
+            self._token_issued_at = time.monotonic()
+            self._schedule_token_refresh()
+            _LOGGER.debug("登录成功，获取到token")
+            
+        except PhnixCircuitOpenError:
+            raise
+        except asyncio.TimeoutError:
+            raise PhnixAPIError(f"登录超时（{timeout}秒）")
         except aiohttp.ClientError as e:
             raise PhnixAPIError(f"网络连接错误: {e}")
         except Exception as e:
             raise PhnixAPIError(f"登录过程中发生错误: {e}")
     
-    async def _ensure_token(self) -> None:
+    async def update_password(self, password: str) -> None:
+        """Log in with a new password, keeping the old one if the login fails."""
+        async with self._login_lock:
+            previous = self.password
+            self.password = password
+            try:
+                await self.login()
+            except PhnixAPIError:
+                self.password = previous
+                raise
+    
+    @property
+    def token_lifetime(self) -> Optional[float]:
+        """Return the estimated token lifetime in seconds, if known."""
+        return self._token_lifetime
+    
+    def _token_age(self) -> Optional[float]:
+        """Return how long ago the current token was issued."""
+        if self._token_issued_at is None:
+            return None
+        return time.monotonic() - self._token_issued_at
+    
+    async def _ensure_token(self, options: PhnixRequestOptions) -> None:
         """Ensure we have a valid token."""
         if not self.token:
-            await self.login()
+            await self._reauthenticate(None, options)
+            return
+        
+        # 后台刷新未能及时执行时（如系统休眠），在请求前同步刷新
+        age = self._token_age()
+        if self._token_lifetime is not None and age is not None and age >= self._token_lifetime:
+            await self._reauthenticate(self.token, options)
+    
+    async def _reauthenticate(
+        self,
+        stale_token: Optional[str],
+        options: PhnixRequestOptions,
+        expired: bool = False,
+    ) -> None:
+        """Log in again, sharing one in-flight login between all callers.
+        
+        Callers pass the token they saw rejected. If another caller already
+        replaced it while we waited for the lock, the fresh token is reused
+        instead of logging in a second time. When expired is set, the age of
+        the rejected token is used to learn the token lifetime.
+        """
+        async with self._login_lock:
+            if self.token and self.token != stale_token:
+                return
+            if expired and stale_token is not None:
+                self._learn_token_lifetime()
+            self.token = None
+            await self.login(options)
+    
+    def _learn_token_lifetime(self) -> None:
+        """Update the lifetime estimate from an observed token expiry.
+        
+        A token that lived longer than the estimate raises it at once. A
+        shorter expiry only becomes the estimate once the next expiry
+        confirms it, so a single early rejection does not pin the refresh
+        interval; the longer of the two observations is kept.
+        """
+        age = self._token_age()
+        if age is None or age < MIN_TOKEN_LIFETIME:
+            return
+        if self._token_lifetime is not None and age >= self._token_lifetime:
+            self._expiry_sample = None
+            self._token_lifetime = age
+            _LOGGER.debug("Token有效期估计上调为 %.0f 秒", age)
+            return
+        
+        previous, self._expiry_sample = self._expiry_sample, age
+        if previous is None:
+            return
+        self._expiry_sample = None
+        self._token_lifetime = max(previous, age)
+        _LOGGER.debug("Token有效期估计更新为 %.0f 秒", self._token_lifetime)
+    
+    def _schedule_token_refresh(self) -> None:
+        """Schedule a background refresh before the current token lapses."""
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self._token_lifetime is None:
+            return
+        
+        delay = self._token_lifetime * TOKEN_REFRESH_MARGIN
+        self._refresh_handle = asyncio.get_running_loop().call_later(
+            delay, self._start_token_refresh
+        )
+    
+    def _start_token_refresh(self) -> None:
+        """Start the background token refresh task."""
+        self._refresh_handle = None
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._refresh_token()
+            )
+    
+    async def _refresh_token(self) -> None:
+        """Replace the current token before it expires."""
+        token = self.token
+        try:
+            async with self._login_lock:
+                if self.token != token:
+                    return
+                _LOGGER.debug("Token即将过期，后台刷新")
+                await self.login()
+                self.metrics.token_refreshes += 1
+        except PhnixAPIError as e:
+            # 刷新失败时保留旧token，请求失败后仍会被动重新登录
+            _LOGGER.warning("后台刷新Token失败: %s", e)
+    
+    @property
+    def circuit_state(self) -> str:
+        """Return the circuit breaker state (closed, open or half_open)."""
+        return self._breaker.state
+    
+    @property
+    def circuit_open(self) -> bool:
+        """Return True while requests fail fast without network I/O."""
+        return self._breaker.state == CircuitBreaker.STATE_OPEN
+    
+    async def _request_json(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        data: Dict[str, Any],
+        timeout: float,
+        options: PhnixRequestOptions,
+    ) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """POST through the circuit breaker and return the status and JSON body.
+        
+        Traffic is recorded per endpoint: request headers and body, response
+        headers and body as transferred, and the decompressed body size.
+        """
+        self._breaker.before_request()
+        endpoints = [metrics.endpoints[_ENDPOINTS[url]] for metrics in self._metrics_for(options)]
+        payload = _json_dumps(data)
+        bytes_sent = _headers_size(headers.items()) + len(payload)
+        start = time.monotonic()
+        try:
+            session = await self._get_session()
+            async with session.post(
+                url,
+                headers=headers,
+                data=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as response:
+                status = response.status
+                body = await response.read()
+                # 压缩响应的Content-Length即线上字节数，分块传输时退回解压后的长度
+                bytes_received = _headers_size(response.raw_headers) + (
+                    response.content_length or len(body)
+                )
+            result = await self._decode(url, body) if status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            for endpoint in endpoints:
+                endpoint.record(time.monotonic() - start, False, bytes_sent)
+            self._breaker.record_failure()
+            raise
+        except BaseException:
+            self._breaker.release_probe()
+            raise
+        
+        latency = time.monotonic() - start
+        for endpoint in endpoints:
+            endpoint.record(
+                latency, status == 200, bytes_sent, bytes_received, len(body)
+            )
+        
+        # 服务器有响应即视为可达，5xx视为服务故障
+        if status >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        return status, result
+    
+    @staticmethod
+    async def _decode(url: str, body: bytes) -> Any:
+        """Decode a JSON body, off the event loop if it is large."""
+        decode = _DECODERS.get(url, _json_loads)
+        if len(body) > JSON_EXECUTOR_THRESHOLD:
+            return await asyncio.get_running_loop().run_in_executor(None, decode, body)
+        return decode(body)
+    
+    async def _post(
+        self,
+        url: str,
+        data: Dict[str, Any],
+        token: str,
+        timeout: float,
+        options: PhnixRequestOptions,
+    ) -> Dict[str, Any]:
+        """Send one authenticated POST request and return the decoded result."""
+        headers = {**_REQUEST_HEADERS, "x-token": token}
+        
+        status, result = await self._request_json(url, headers, data, timeout, options)
+        if status == 401:
+            raise PhnixAuthError("Token已过期，HTTP状态码: 401")
+        if status != 200:
+            raise PhnixAPIError(f"API请求失败，HTTP状态码: {status}")
+        
+        # 检查是否需要重新登录（即使状态码是200）
+        if not result.get("isReusltSuc"):
+            error_msg = result.get("error_msg", "")
+            if _is_auth_error_message(error_msg):
+                raise PhnixAuthError(f"服务器要求重新登录: {error_msg}")
+        
+        return result
     
     async def _make_request(
         self, 
         url: str, 
         data: Dict[str, Any], 
+        timeout: float,
+        options: PhnixRequestOptions,
         retry_on_auth_error: bool = True
     ) -> Dict[str, Any]:
-        """Make API request with token handling."""
+        """Make API request with token handling.
+        
+        timeout bounds each HTTP attempt only. A retry after re-login starts
+        a new attempt, so callers bound the whole operation with _deadline.
+        A login on the way uses the login timeout of options.
+        """
         try:
-            await self._ensure_token()
+            await self._ensure_token(options)
+            token = self.token
             
-            session = await self._get_session()
-            headers = {**DEFAULT_HEADERS, "x-token": self.token}
-            
-            async with session.post(url, headers=headers, json=data) as response:
-                if response.status == 401 and retry_on_auth_error:
-                    _LOGGER.warning("Token可能已过期，尝试重新登录")
-                    self.token = None
-                    await self.login()
-                    headers = {**DEFAULT_HEADERS, "x-token": self.token}
-                    
-                    async with session.post(url, headers=headers, json=data) as retry_response:
-                        if retry_response.status != 200:
-                            raise PhnixAPIError(f"API请求失败，HTTP状态码: {retry_response.status}")
-                        return await retry_response.json()
-                
-                if response.status != 200:
-                    raise PhnixAPIError(f"API请求失败，HTTP状态码: {response.status}")
-                
-                result = await response.json()
-                
-                # 检查是否需要重新登录（即使状态码是200）
-                if not result.get("isReusltSuc") and retry_on_auth_error:
-                    error_msg = result.get("error_msg", "")
-                    if "请重新登录" in error_msg or "token" in error_msg.lower() or "登录" in error_msg:
-                        _LOGGER.warning("服务器要求重新登录，尝试重新登录")
-                        self.token = None
-                        await self.login()
-                        headers = {**DEFAULT_HEADERS, "x-token": self.token}
-                        
-                        async with session.post(url, headers=headers, json=data) as retry_response:
-                            if retry_response.status != 200:
-                                raise PhnixAPIError(f"API请求失败，HTTP状态码: {retry_response.status}")
-                            return await retry_response.json()
-                
-                return result
+            try:
+                return await self._post(url, data, token, timeout, options)
+            except PhnixAuthError:
+                if not retry_on_auth_error:
+                    raise
+                _LOGGER.warning("Token可能已过期，尝试重新登录")
+                for metrics in self._metrics_for(options):
+                    metrics.endpoints[_ENDPOINTS[url]].retries += 1
+                # 并发请求共享同一次重新登录，重试时使用新token
+                await self._reauthenticate(token, options, expired=True)
+                return await self._post(url, data, self.token, timeout, options)
                 
+        except PhnixAPIError:
+            raise
+        except asyncio.TimeoutError:
+            raise PhnixAPIError(f"API请求超时（{timeout}秒）")
         except aiohttp.ClientError as e:
             raise PhnixAPIError(f"网络连接错误: {e}")
         except Exception as e:
             raise PhnixAPIError(f"API请求过程中发生错误: {e}")
     
-    async def _get_protocol_id(self) -> str:
-        """Get protocol ID for the device."""
-        if self._protocol_id:
-            return self._protocol_id
-            
-        # 使用默认协议ID
-        self._protocol_id = "1679324789907087360"
-        return self._protocol_id
-    
-    async def set_power(self, power: bool) -> None:
-        """Set device power state."""
-        protocol_id = await self._get_protocol_id()
-        value = POWER_ON if power else POWER_OFF
+    def _cached_protocol_id(self, device_code: str, stale: Optional[str]) -> Optional[str]:
+        """Return the cached protocol ID unless it expired or was just rejected.
         
-        data = {
-            "deviceCode": self.device_code,
-            "protocalId": protocol_id,
-            "address": POWER_ADDRESS,
-            "value": value
-        }
+        A rejected ID is still returned if it was discovered recently, so a
+        device that keeps answering oddly cannot cause a discovery per poll.
+        """
+        cached = self.protocol_cache.get(device_code)
+        if cached is None:
+            return None
+        age = time.time() - cached.get("discovered_at", 0)
+        if age >= PROTOCOL_CACHE_TTL:
+            return None
+        if cached["protocol_id"] == stale and age >= PROTOCOL_REDISCOVERY_INTERVAL:
+            return None
+        return cached["protocol_id"]
+    
+    async def _get_protocol_id(
+        self, device_code: str, options: PhnixRequestOptions, stale: Optional[str] = None
+    ) -> str:
+        """Get the protocol ID of a device, discovering it if needed.
         
-        result = await self._make_request(CONTROL_URL, data)
+        Callers pass the ID a request was just rejected with as stale to
+        force a new discovery. Concurrent callers share one discovery.
+        """
+        protocol_id = self._cached_protocol_id(device_code, stale)
+        if protocol_id is not None:
+            return protocol_id
         
-        if not result.get("isReusltSuc"):
-            error_msg = result.get("error_msg", "未知错误")
-            raise PhnixAPIError(f"设置电源状态失败: {error_msg}")
+        async with self._protocol_lock:
+            protocol_id = self._cached_protocol_id(device_code, stale)
+            if protocol_id is not None:
+                return protocol_id
+            
+            protocol_id = await self._discover_protocol_id(device_code, options)
+            self.protocol_cache[device_code] = {
+                "protocol_id": protocol_id,
+                "discovered_at": time.time(),
+            }
+            if self.protocol_listener is not None:
+                self.protocol_listener()
+            return protocol_id
     
-    async def set_mode(self, mode: str) -> None:
-        """Set device mode (cool/heat)."""
-        protocol_id = await self._get_protocol_id()
-        value = MODE_COOL if mode == "cool" else MODE_HEAT
+    async def _discover_protocol_id(
+        self, device_code: str, options: PhnixRequestOptions
+    ) -> str:
+        """Ask the cloud which protocol a device uses.
         
+        The parameter config endpoint does not need a protocol ID and its
+        rows carry the one the device is bound to. Devices whose response
+        lacks it keep using the default ID. Network errors are raised so
+        that nothing is cached from a failed lookup.
+        """
         data = {
-            "deviceCode": self.device_code,
-            "protocalId": protocol_id,
-            "address": MODE_ADDRESS,
-            "value": value
+            "deviceCode": device_code,
+            "pageIndex": 1,
+            "pageSize": 1,
+            "address": POWER_ADDRESS
         }
         
-        result = await self._make_request(CONTROL_URL, data)
+        result = await self._make_request(CONFIG_URL, data, options.status_timeout, options)
+        protocol_id = None
+        if result.get("isReusltSuc"):
+            protocol_id = _find_protocol_id(result.get("objectResult"))
         
-        if not result.get("isReusltSuc"):
-            error_msg = result.get("error_msg", "未知错误")
-            raise PhnixAPIError(f"设置工作模式失败: {error_msg}")
+        if protocol_id is None:
+            _LOGGER.debug("设备 %s 未返回协议ID，使用默认协议ID", device_code)
+            return DEFAULT_PROTOCOL_ID
+        _LOGGER.debug("设备 %s 使用协议ID %s", device_code, protocol_id)
+        return protocol_id
     
-    async def set_temperature(self, temperature: float, mode: str) -> None:
-        """Set target temperature."""
-        protocol_id = await self._get_protocol_id()
-        address = COOL_TEMP_ADDRESS if mode == "cool" else HEAT_TEMP_ADDRESS
+    async def _write_register(
+        self,
+        device_code: str,
+        address: str,
+        value: str,
+        description: str,
+        options: PhnixRequestOptions,
+    ) -> None:
+        """Queue a control write, coalescing bursts and skipping no-ops.
         
-        data = {
-            "deviceCode": self.device_code,
-            "protocalId": protocol_id,
-            "address": address,
-            "value": str(int(temperature))
-        }
-        
-        result = await self._make_request(CONTROL_URL, data)
+        Writes are held for WRITE_DEBOUNCE seconds. Later writes to the same
+        register replace the queued value and every caller waits for the
+        final result. All registers queued in the same window are sent
+        concurrently. A write is skipped only if a poll has confirmed that
+        the register already holds the value.
+        """
+        key = (device_code, address)
+        pending = self._pending_writes.get(key)
+        if pending is None:
+            if _same_value(self._register_values.get(key), value):
+                _LOGGER.debug("跳过与当前值相同的写入: %s %s=%s", device_code, address, value)
+                return
+            loop = asyncio.get_running_loop()
+            pending = _PendingWrite(loop.create_future())
+            self._pending_writes[key] = pending
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_later(WRITE_DEBOUNCE, self._start_flush)
         
-        if not result.get("isReusltSuc"):
-            error_msg = result.get("error_msg", "未知错误")
-            raise PhnixAPIError(f"设置温度失败: {error_msg}")
+        pending.value = value
+        pending.description = description
+        pending.options = options
+        await asyncio.shield(pending.future)
     
-    async def get_device_status(self) -> List[Dict[str, Any]]:
-        """Get complete device status."""
-        protocol_id = await self._get_protocol_id()
+    def _start_flush(self) -> None:
+        """Send all writes queued in the closed debounce window."""
+        self._flush_handle = None
+        writes, self._pending_writes = self._pending_writes, {}
+        task = asyncio.get_running_loop().create_task(self._flush_writes(writes))
+        self._write_tasks.add(task)
+        task.add_done_callback(self._write_tasks.discard)
+    
+    async def _flush_writes(self, writes: Dict[Tuple[str, str], _PendingWrite]) -> None:
+        """Send independent register writes concurrently.
         
-        data = {
-            "protocalId": protocol_id,
-            "pageIndex": 1,
-            "pageSize": 9999,
-            "deviceCode": self.device_code,
-            "content": "",
-            "num": ""
-        }
+        A register whose final queued value equals its current value, e.g.
+        after dragging a setpoint away and back, is resolved without a send.
+        """
+        for key, pending in list(writes.items()):
+            if _same_value(self._register_values.get(key), pending.value):
+                _LOGGER.debug("跳过与当前值相同的写入: %s %s=%s", *key, pending.value)
+                del writes[key]
+                pending.future.set_result(None)
         
-        result = await self._make_request(STATUS_URL, data)
+        results = await asyncio.gather(
+            *(
+                self._send_control(
+                    device_code, address, pending.value, pending.description, pending.options
+                )
+                for (device_code, address), pending in writes.items()
+            ),
+            return_exceptions=True,
+        )
+        for pending, result in zip(writes.values(), results):
+            if pending.future.done():
+                continue
+            if isinstance(result, asyncio.CancelledError):
+                pending.future.cancel()
+            elif isinstance(result, BaseException):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(None)
+    
+    async def _send_control(
+        self,
+        device_code: str,
+        address: str,
+        value: str,
+        description: str,
+        options: PhnixRequestOptions,
+    ) -> None:
+        """Write one control register within the control deadline."""
+        timeout = options.control_timeout
+        async with self._deadline(timeout, ENDPOINT_CONTROL, description, options):
+            protocol_id = await self._get_protocol_id(device_code, options)
+            
+            data = {
+                "deviceCode": device_code,
+                "protocalId": protocol_id,
+                "address": address,
+                "value": value
+            }
+            
+            result = await self._make_request(CONTROL_URL, data, timeout, options)
+            if _is_protocol_mismatch(result, expect_rows=False):
+                # 协议ID不匹配时重新发现一次，得到不同的ID才重试
+                new_protocol_id = await self._get_protocol_id(device_code, options, protocol_id)
+                if new_protocol_id != protocol_id:
+                    data["protocalId"] = new_protocol_id
+                    result = await self._make_request(CONTROL_URL, data, timeout, options)
+            
+            if not result.get("isReusltSuc"):
+                error_msg = result.get("error_msg", "未知错误")
+                raise PhnixAPIError(f"{description}失败: {error_msg}")
+            
+        # 设备可能限制或忽略写入的值，经轮询确认前不作为当前值
+        key = (device_code, address)
+        self._register_values.pop(key, None)
+        self._unconfirmed_writes[key] = (value, time.monotonic())
+    
+    def _update_register_values(self, device_code: str, snapshot: PhnixStatusSnapshot) -> None:
+        """Refresh the cached control register values from a status snapshot.
         
-        if not result.get("isReusltSuc"):
-            error_msg = result.get("error_msg", "未知错误")
-            raise PhnixAPIError(f"获取设备状态失败: {error_msg}")
+        A written value only becomes current once a poll reports it. Until
+        then, or until WRITE_CONFIRM_WINDOW has passed, the register keeps
+        no value, so a repeated write is sent instead of being skipped.
+        """
+        now = time.monotonic()
+        for address, status_address in CONTROL_STATUS_ADDRESSES.items():
+            key = (device_code, address)
+            value = snapshot.get(status_address)
+            unconfirmed = self._unconfirmed_writes.get(key)
+            if unconfirmed is not None:
+                written_value, written_at = unconfirmed
+                if not _same_value(value, written_value) and now - written_at < WRITE_CONFIRM_WINDOW:
+                    # 设备可能尚未应用写入的值，也可能拒绝了它
+                    self._register_values.pop(key, None)
+                    continue
+                del self._unconfirmed_writes[key]
+            if value is None:
+                self._register_values.pop(key, None)
+            else:
+                self._register_values[key] = value
+    
+    async def set_power(
+        self,
+        power: bool,
+        device_code: Optional[str] = None,
+        options: Optional[PhnixRequestOptions] = None,
+    ) -> None:
+        """Set device power state."""
+        value = POWER_ON if power else POWER_OFF
+        await self._write_register(
+            device_code or self.device_code, POWER_ADDRESS, value, "设置电源状态",
+            options or self.options,
+        )
+    
+    async def set_mode(
+        self,
+        mode: str,
+        device_code: Optional[str] = None,
+        options: Optional[PhnixRequestOptions] = None,
+    ) -> None:
+        """Set device mode (cool/heat)."""
+        value = MODE_COOL if mode == "cool" else MODE_HEAT
+        await self._write_register(
+            device_code or self.device_code, MODE_ADDRESS, value, "设置工作模式",
+            options or self.options,
+        )
+    
+    async def set_temperature(
+        self,
+        temperature: float,
+        mode: str,
+        device_code: Optional[str] = None,
+        options: Optional[PhnixRequestOptions] = None,
+    ) -> None:
+        """Set target temperature."""
+        address = COOL_TEMP_ADDRESS if mode == "cool" else HEAT_TEMP_ADDRESS
+        await self._write_register(
+            device_code or self.device_code, address, str(int(temperature)), "设置温度",
+            options or self.options,
+        )
+    
+    async def _timed_status_request(
+        self, data: Dict[str, Any], options: PhnixRequestOptions
+    ) -> Dict[str, Any]:
+        """Request device status and record the latency of successful attempts."""
+        start = time.monotonic()
+        result = await self._make_request(STATUS_URL, data, options.status_timeout, options)
+        self._status_latencies.append(time.monotonic() - start)
+        return result
+    
+    def _hedge_delay(self, timeout: float) -> float:
+        """Return how long to wait before hedging, from observed status latency."""
+        if len(self._status_latencies) < HEDGE_MIN_SAMPLES:
+            return min(HEDGE_DEFAULT_DELAY, timeout)
+        latencies = sorted(self._status_latencies)
+        delay = latencies[int(HEDGE_QUANTILE * (len(latencies) - 1))]
+        return min(max(delay, HEDGE_MIN_DELAY), timeout)
+    
+    async def _hedged(
+        self, factory: Callable[[], Awaitable[_T]], options: PhnixRequestOptions
+    ) -> _T:
+        """Run an idempotent request, starting a second attempt if it is slow.
+        
+        The result of whichever attempt succeeds first is returned and the
+        other attempt is cancelled. Only if both fail is the last error raised.
+        The status timeout of options caps the hedging delay.
+        """
+        pending = {asyncio.ensure_future(factory())}
+        try:
+            done, pending = await asyncio.wait(
+                pending, timeout=self._hedge_delay(options.status_timeout)
+            )
+            if done:
+                return done.pop().result()
+            
+            _LOGGER.debug("状态请求超过对冲阈值，发起第二个请求")
+            for metrics in self._metrics_for(options):
+                metrics.hedged_requests += 1
+            pending.add(asyncio.ensure_future(factory()))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _fetch_status(
+        self, data: Dict[str, Any], options: PhnixRequestOptions
+    ) -> Dict[str, Any]:
+        """Send one status request, hedged if enabled."""
+        if options.hedge_status_reads:
+            return await self._hedged(lambda: self._timed_status_request(data, options), options)
+        return await self._timed_status_request(data, options)
+    
+    async def get_device_status(
+        self,
+        plan: Optional[DecoderPlan] = None,
+        device_code: Optional[str] = None,
+        options: Optional[PhnixRequestOptions] = None,
+    ) -> PhnixStatusSnapshot:
+        """Get device status decoded by a plan.
         
+        The plan should include the control registers (see
+        add_control_registers); without one only those are decoded.
+        device_code defaults to the client's primary device. The status
+        timeout of options bounds the whole read, including protocol
+        discovery, re-login and retries.
+        """
+        device_code = device_code or self.device_code
+        options = options or self.options
+        async with self._deadline(
+            options.status_timeout, ENDPOINT_STATUS, "获取设备状态", options
+        ):
+            protocol_id = await self._get_protocol_id(device_code, options)
+            
+            data = {
+                "protocalId": protocol_id,
+                "pageIndex": 1,
+                "pageSize": 9999,
+                "deviceCode": device_code,
+                "content": "",
+                "num": ""
+            }
+            
+            result = await self._fetch_status(data, options)
+            if _is_protocol_mismatch(result, expect_rows=True):
+                # 协议ID不匹配时重新发现一次，得到不同的ID才重试
+                new_protocol_id = await self._get_protocol_id(device_code, options, protocol_id)
+                if new_protocol_id != protocol_id:
+                    data["protocalId"] = new_protocol_id
+                    result = await self._fetch_status(data, options)
+            
+            if not result.get("isReusltSuc"):
+                error_msg = result.get("error_msg", "未知错误")
+                raise PhnixAPIError(f"获取设备状态失败: {error_msg}")
+            
         object_result = result.get("objectResult", {})
-        data_list = object_result.get("dataList", [])
+        data_list = object_result.get("dataList") or []
         
-        return data_list
+        # 服务器不支持按地址过滤，解码时跳过计划之外的行
+        snapshot = (plan or _CONTROL_PLAN).decode(data_list)
+        self._update_register_values(device_code, snapshot)
+        polled_at = datetime.now(timezone.utc)
+        for metrics in self._metrics_for(options):
+            metrics.last_successful_poll = polled_at
+        return snapshot
     
-    async def get_device_config(self, address: str) -> List[Dict[str, Any]]:
+    async def get_device_config(
+        self,
+        address: str,
+        device_code: Optional[str] = None,
+        options: Optional[PhnixRequestOptions] = None,
+    ) -> List[Dict[str, Any]]:
         """Get device configuration for specific address."""
-        protocol_id = await self._get_protocol_id()
-        
         data = {
-            "deviceCode": self.device_code,
+            "deviceCode": device_code or self.device_code,
             "pageIndex": 1,
             "pageSize": 10,
             "address": address
         }
         
-        result = await self._make_request(CONFIG_URL, data)
+        options = options or self.options
+        result = await self._make_request(CONFIG_URL, data, options.status_timeout, options)
         
         if not result.get("isReusltSuc"):
             error_msg = result.get("error_msg", "未知错误")
@@ -248,5 +1063,18 @@ class PhnixAPI:
     
     async def close(self) -> None:
         """Close the API client."""
-        if self.session and not self.session.closed:
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for pending in self._pending_writes.values():
+            pending.future.cancel()
+        self._pending_writes = {}
+        for task in self._write_tasks:
+            task.cancel()
+        if self._owns_session and self.session and not self.session.closed:
             await self.session.close() 
\ No newline at end of file
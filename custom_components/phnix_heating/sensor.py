@@ -1,5 +1,6 @@
 """Sensor platform for Phnix Heating integration."""
 import logging
+import time
 from typing import Any, Optional
 
 from homeassistant.components.sensor import (
@@ -17,17 +18,30 @@ from homeassistant.const import (
     UnitOfVolumeFlowRate,
     UnitOfElectricCurrent,
     UnitOfElectricPotential,
+    UnitOfInformation,
+    UnitOfTime,
     PERCENTAGE,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
-from .phnix_api import PhnixAPI
+from .const import DOMAIN, SENSOR_MAX_AGE, OUTPUT_ADDRESS, SAFETY_ADDRESS
+from .coordinator import PhnixDataUpdateCoordinator
+from .entity import PhnixEntity
+from .metrics import ENDPOINT_LOGIN, ENDPOINT_STATUS
+from .snapshot import PhnixStatusSnapshot, to_number
 
 _LOGGER = logging.getLogger(__name__)
 
 # 传感器定义
+# 可选的发布过滤参数（减少记录器写入）：
+#   deadband: 数值变化小于该值时不发布新状态
+#   min_interval: 两次发布之间的最短间隔（秒）
+#   max_age: 超过该时间（秒）后无论变化多少都发布，默认为SENSOR_MAX_AGE
+# bitmask为True的传感器发布该地址所有行组成的位图（见const.BITMASK_REGISTERS）
+# 仅排查故障时有用的传感器标记为诊断实体并默认禁用（entity_category、enabled_default），
+# 保持禁用时其寄存器不会被解码
 SENSORS = [
     # 温度传感器
     {
@@ -37,6 +51,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "outlet_water_temp",
@@ -45,6 +60,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "indoor_temp",
@@ -53,6 +69,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "ambient_temp",
@@ -61,6 +78,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "coil_temp",
@@ -69,6 +87,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "suction_temp",
@@ -77,6 +96,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "exhaust_temp",
@@ -85,6 +105,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "frost_temp",
@@ -93,6 +114,9 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "hot_water_temp",
@@ -101,6 +125,7 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
     },
     {
         "key": "evi_inlet_temp",
@@ -109,6 +134,9 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "evi_outlet_temp",
@@ -117,6 +145,9 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     
     # 压力传感器
@@ -155,6 +186,8 @@ SENSORS = [
         "unit": UnitOfElectricPotential.VOLT,
         "device_class": SensorDeviceClass.VOLTAGE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 2,
+        "min_interval": 60,
     },
     {
         "key": "ac_current",
@@ -163,6 +196,8 @@ SENSORS = [
         "unit": UnitOfElectricCurrent.AMPERE,
         "device_class": SensorDeviceClass.CURRENT,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
+        "min_interval": 60,
     },
     {
         "key": "comp_current",
@@ -171,6 +206,10 @@ SENSORS = [
         "unit": UnitOfElectricCurrent.AMPERE,
         "device_class": SensorDeviceClass.CURRENT,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 0.2,
+        "min_interval": 60,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "dc_bus_voltage",
@@ -179,6 +218,10 @@ SENSORS = [
         "unit": UnitOfElectricPotential.VOLT,
         "device_class": SensorDeviceClass.VOLTAGE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "deadband": 2,
+        "min_interval": 60,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "ipm_temp",
@@ -187,6 +230,8 @@ SENSORS = [
         "unit": UnitOfTemperature.CELSIUS,
         "device_class": SensorDeviceClass.TEMPERATURE,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "power_input",
@@ -237,6 +282,8 @@ SENSORS = [
         "unit": "rpm",
         "device_class": None,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "eev_opening",
@@ -245,6 +292,8 @@ SENSORS = [
         "unit": None,
         "device_class": None,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "evi_eev_opening",
@@ -253,6 +302,8 @@ SENSORS = [
         "unit": None,
         "device_class": None,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "comp_runtime",
@@ -279,6 +330,8 @@ SENSORS = [
         "unit": None,
         "device_class": None,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "dtu_online",
@@ -287,6 +340,8 @@ SENSORS = [
         "unit": None,
         "device_class": None,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
     },
     {
         "key": "multi_unit_comm",
@@ -295,6 +350,108 @@ SENSORS = [
         "unit": None,
         "device_class": None,
         "state_class": SensorStateClass.MEASUREMENT,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "enabled_default": False,
+    },
+    
+    # 位图诊断传感器：一个数值即可反映所有输出/安全开关的状态
+    {
+        "key": "output_mask",
+        "name": "输出状态位图",
+        "address": OUTPUT_ADDRESS,
+        "unit": None,
+        "device_class": None,
+        "state_class": None,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "bitmask": True,
+        "enabled_default": False,
+    },
+    {
+        "key": "safety_mask",
+        "name": "安全开关位图",
+        "address": SAFETY_ADDRESS,
+        "unit": None,
+        "device_class": None,
+        "state_class": None,
+        "entity_category": EntityCategory.DIAGNOSTIC,
+        "bitmask": True,
+        "enabled_default": False,
+    },
+]
+
+# 集成运行状况诊断传感器，数值来自配置项自身请求的指标（协调器的metrics）
+DIAGNOSTIC_SENSORS = [
+    {
+        "key": "api_requests",
+        "name": "云端请求数",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "enabled_default": True,
+        "value": lambda metrics: metrics.requests,
+    },
+    {
+        "key": "api_failures",
+        "name": "云端请求失败数",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "enabled_default": True,
+        "value": lambda metrics: metrics.failures,
+    },
+    {
+        "key": "api_retries",
+        "name": "云端请求重试数",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "enabled_default": False,
+        "value": lambda metrics: metrics.retries,
+    },
+    {
+        "key": "api_logins",
+        "name": "登录次数",
+        "unit": None,
+        "device_class": None,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "enabled_default": False,
+        "value": lambda metrics: metrics.endpoints[ENDPOINT_LOGIN].requests,
+    },
+    {
+        "key": "api_bytes_sent",
+        "name": "云端发送数据量",
+        "unit": UnitOfInformation.BYTES,
+        "device_class": SensorDeviceClass.DATA_SIZE,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "enabled_default": False,
+        "value": lambda metrics: metrics.bytes_sent,
+    },
+    {
+        "key": "api_bytes_received",
+        "name": "云端接收数据量",
+        "unit": UnitOfInformation.BYTES,
+        "device_class": SensorDeviceClass.DATA_SIZE,
+        "state_class": SensorStateClass.TOTAL_INCREASING,
+        "enabled_default": False,
+        "value": lambda metrics: metrics.bytes_received,
+    },
+    {
+        "key": "api_status_latency_p95",
+        "name": "状态请求延迟P95",
+        "unit": UnitOfTime.SECONDS,
+        "device_class": SensorDeviceClass.DURATION,
+        "state_class": SensorStateClass.MEASUREMENT,
+        "enabled_default": False,
+        "value": lambda metrics: metrics.endpoints[ENDPOINT_STATUS].latency_quantile(0.95),
+    },
+    {
+        "key": "api_last_successful_poll",
+        "name": "最近成功轮询",
+        "unit": None,
+        "device_class": SensorDeviceClass.TIMESTAMP,
+        "state_class": None,
+        "enabled_default": True,
+        "value": lambda metrics: metrics.last_successful_poll,
     },
 ]
 
@@ -304,69 +461,130 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Phnix Heating sensor platform."""
-    api = hass.data[DOMAIN][config_entry.entry_id]
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
     
     entities = []
-    for sensor_config in SENSORS:
-        entities.append(PhnixSensor(api, config_entry, sensor_config))
+    for device_code in coordinator.device_codes:
+        for sensor_config in SENSORS:
+            entities.append(PhnixSensor(coordinator, device_code, sensor_config))
+    
+    # 诊断传感器反映本配置项的请求，只挂在主设备下
+    for sensor_config in DIAGNOSTIC_SENSORS:
+        entities.append(
+            PhnixDiagnosticSensor(coordinator, coordinator.device_codes[0], sensor_config)
+        )
     
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
-class PhnixSensor(SensorEntity):
+class PhnixSensor(PhnixEntity, SensorEntity):
     """Representation of a Phnix Heating sensor."""
     
-    _attr_has_entity_name = True
-    
-    def __init__(self, api: PhnixAPI, config_entry: ConfigEntry, sensor_config: dict):
+    def __init__(
+        self,
+        coordinator: PhnixDataUpdateCoordinator,
+        device_code: str,
+        sensor_config: dict,
+    ):
         """Initialize the sensor."""
-        self.api = api
-        self.config_entry = config_entry
+        super().__init__(coordinator, device_code, sensor_config["key"])
         self.sensor_config = sensor_config
+        if sensor_config.get("bitmask"):
+            self._slot = coordinator.plan.bitmask_slot(sensor_config["address"])
+        else:
+            self._slot = coordinator.plan.slot(sensor_config["address"], None, to_number)
         
         # 设置实体属性
-        self._attr_unique_id = f"{config_entry.entry_id}_{sensor_config['key']}"
         self._attr_name = sensor_config["name"]
         self._attr_native_unit_of_measurement = sensor_config["unit"]
         self._attr_device_class = sensor_config["device_class"]
         self._attr_state_class = sensor_config["state_class"]
+        self._attr_entity_category = sensor_config.get("entity_category")
+        self._attr_entity_registry_enabled_default = sensor_config.get("enabled_default", True)
         
         # 状态属性
         self._attr_native_value = None
-        self._attr_available = False
+        self._published_at: Optional[float] = None
+        self._init_from_status()
+    
+    def _update_from_status(self, snapshot: PhnixStatusSnapshot) -> bool:
+        """Update the sensor state from the shared status snapshot."""
+        native_value = snapshot.value(self._slot)
+        if self.coordinator.restored_at is not None:
+            # 恢复的值不算发布，首次实时轮询不受发布间隔和死区限制
+            changed = native_value != self._attr_native_value
+            self._attr_native_value = native_value
+            self._published_at = None
+            return changed
+        if native_value == self._attr_native_value:
+            return False
+        if not self._should_publish(native_value):
+            return False
+        
+        self._attr_native_value = native_value
+        self._published_at = time.monotonic()
+        return True
+    
+    def _should_publish(self, native_value: Any) -> bool:
+        """Apply the sensor's deadband and publish interval to a new value."""
+        if self._published_at is None or native_value is None or self._attr_native_value is None:
+            return True
+        
+        age = time.monotonic() - self._published_at
+        if age >= self.sensor_config.get("max_age", SENSOR_MAX_AGE):
+            return True
+        
+        min_interval = self.sensor_config.get("min_interval")
+        if min_interval is not None and age < min_interval:
+            return False
+        
+        deadband = self.sensor_config.get("deadband")
+        if (
+            deadband is not None
+            and isinstance(native_value, (int, float))
+            and isinstance(self._attr_native_value, (int, float))
+        ):
+            # 取整避免浮点误差，如 21.7 - 21.5
+            return round(abs(native_value - self._attr_native_value), 6) >= deadband
+        
+        return True
+
+class PhnixDiagnosticSensor(PhnixEntity, SensorEntity):
+    """Diagnostic sensor exposing the health metrics of a config entry's requests."""
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    
+    def __init__(
+        self,
+        coordinator: PhnixDataUpdateCoordinator,
+        device_code: str,
+        sensor_config: dict,
+    ):
+        """Initialize the diagnostic sensor."""
+        super().__init__(coordinator, device_code, sensor_config["key"])
+        self.sensor_config = sensor_config
+        
+        # 设置实体属性
+        self._attr_name = sensor_config["name"]
+        self._attr_native_unit_of_measurement = sensor_config["unit"]
+        self._attr_device_class = sensor_config["device_class"]
+        self._attr_state_class = sensor_config["state_class"]
+        self._attr_entity_registry_enabled_default = sensor_config["enabled_default"]
+        self._attr_native_value = sensor_config["value"](coordinator.metrics)
+    
+    @property
+    def available(self) -> bool:
+        """Return True; metrics stay readable while the cloud is unreachable."""
+        return True
+    
+    @property
+    def extra_state_attributes(self) -> None:
+        """Return no attributes; metrics are never restored from storage."""
+        return None
     
-    async def async_update(self) -> None:
-        """Update the sensor state."""
-        try:
-            # 获取设备状态
-            status_data = await self.api.get_device_status()
-            
-            # 查找对应的数据
-            address = self.sensor_config["address"]
-            for item in status_data:
-                if item["address"] == address:
-                    value = item.get("dataValue")
-                    if value is not None:
-                        try:
-                            # 尝试转换为数值
-                            if "." in value:
-                                self._attr_native_value = float(value)
-                            else:
-                                self._attr_native_value = int(value)
-                        except (ValueError, TypeError):
-                            self._attr_native_value = value
-                    else:
-                        self._attr_native_value = None
-                    break
-            else:
-                self._attr_native_value = None
-            
-            self._attr_available = True
-            
-        except Exception as e:
-            error_msg = str(e)
-            # 如果是登录相关错误，记录为警告而不是错误，因为会自动重试
-            if "请重新登录" in error_msg or "登录" in error_msg:
-                _LOGGER.warning("Sensor %s 更新时遇到登录问题，将自动重试: %s", self._attr_name, error_msg)
-            else:
-                _LOGGER.error("Failed to update sensor %s: %s", self._attr_name, e)
-            self._attr_available = False 
\ No newline at end of file
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Refresh the metric after every poll, successful or not."""
+        native_value = self.sensor_config["value"](self.coordinator.metrics)
+        if native_value != self._attr_native_value:
+            self._attr_native_value = native_value
+            self.async_write_ha_state()
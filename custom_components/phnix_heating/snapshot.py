@@ -0,0 +1,224 @@
+"""Compiled status decoding for Phnix Heating integration."""
+from typing import (
+    Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence,
+    Tuple
+)
+
+Converter = Callable[[str], Any]
+
+def to_raw(value: str) -> str:
+    """Return the raw dataValue unchanged."""
+    return value
+
+def to_number(value: str) -> Any:
+    """Convert a dataValue to int or float, keeping non-numeric text as-is."""
+    try:
+        # 尝试转换为数值
+        if "." in value:
+            return float(value)
+        return int(value)
+    except (ValueError, TypeError):
+        return value
+
+def to_float(value: str) -> Optional[float]:
+    """Convert a dataValue to float, returning None if invalid."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+def to_bool(value: str) -> bool:
+    """Convert a switch dataValue to bool."""
+    return value == "1"
+
+class DecoderPlan:
+    """Fixed snapshot slots for the registers the integration reads.
+    
+    Registers are (address, num) keys; a num of None selects the first
+    row of the address. Fields add a converter to a register and get a
+    slot in the decoded snapshot, so entities look their typed value up
+    by index instead of parsing the raw string on every update. Bitmask
+    fields fold all rows of one address into an integer, one bit per num.
+    """
+    
+    __slots__ = (
+        "_keys", "_key_index", "_lookup", "_fields", "_field_index", "_slot_count"
+    )
+    
+    def __init__(self) -> None:
+        """Initialize an empty plan."""
+        self._keys: List[Tuple[str, Optional[str]]] = []
+        self._key_index: Dict[Tuple[str, Optional[str]], int] = {}
+        # address -> [首行寄存器序号, {num: 寄存器序号}, 位图(槽位, {num: 位})]
+        self._lookup: Dict[str, List[Any]] = {}
+        self._fields: List[Tuple[int, int, Converter]] = []
+        self._field_index: Dict[Tuple[str, Optional[str], Any], int] = {}
+        self._slot_count = 0
+    
+    def add_register(self, address: str, num: Optional[str] = None) -> int:
+        """Keep a register's raw value in decoded snapshots; return its index."""
+        key = (address, num or None)
+        index = self._key_index.get(key)
+        if index is not None:
+            return index
+        
+        index = len(self._keys)
+        self._keys.append(key)
+        self._key_index[key] = index
+        entry = self._lookup.setdefault(address, [None, {}, None])
+        if key[1] is None:
+            entry[0] = index
+        else:
+            entry[1][key[1]] = index
+        return index
+    
+    def add_field(
+        self, address: str, num: Optional[str] = None, converter: Converter = to_raw
+    ) -> int:
+        """Decode a register with a converter; return the field's slot."""
+        field = (address, num or None, converter)
+        slot = self._field_index.get(field)
+        if slot is None:
+            slot = self._new_slot(field)
+            self._fields.append((slot, self.add_register(address, num), converter))
+        return slot
+    
+    def add_bitmask(self, address: str, bits: Mapping[str, int]) -> int:
+        """Decode the rows of an address into a bitmask; return the field's slot.
+        
+        bits maps each row's num to its bit position. A row sets its bit
+        when its dataValue is "1".
+        """
+        field = (address, None, "bitmask")
+        slot = self._field_index.get(field)
+        if slot is None:
+            slot = self._new_slot(field)
+            # 各行的原始值同样保留，持久化的快照恢复后可重新得到位图
+            for num in bits:
+                self.add_register(address, num)
+            self._lookup[address][2] = (slot, dict(bits))
+        return slot
+    
+    def _new_slot(self, field: Tuple[str, Optional[str], Any]) -> int:
+        """Allocate the next snapshot slot for a field."""
+        slot = self._slot_count
+        self._slot_count += 1
+        self._field_index[field] = slot
+        return slot
+    
+    def slot(
+        self, address: str, num: Optional[str] = None, converter: Converter = to_raw
+    ) -> Optional[int]:
+        """Return the slot of a field, or None if the plan does not decode it."""
+        return self._field_index.get((address, num or None, converter))
+    
+    def bitmask_slot(self, address: str) -> Optional[int]:
+        """Return the slot of an address's bitmask, or None if not decoded."""
+        return self._field_index.get((address, None, "bitmask"))
+    
+    def register_index(self, address: str, num: Optional[str] = None) -> Optional[int]:
+        """Return the index of a register, or None if the plan does not keep it."""
+        return self._key_index.get((address, num or None))
+    
+    @property
+    def keys(self) -> Sequence[Tuple[str, Optional[str]]]:
+        """Return the (address, num) key of every register by index."""
+        return self._keys
+    
+    @property
+    def addresses(self) -> FrozenSet[str]:
+        """Return the addresses the plan reads."""
+        return frozenset(self._lookup)
+    
+    def decode(
+        self, rows: Iterable[Sequence[Optional[str]]]
+    ) -> "PhnixStatusSnapshot":
+        """Decode (address, num, dataValue) rows into a snapshot in a single pass.
+        
+        Rows for registers outside the plan are skipped without being
+        converted.
+        """
+        lookup = self._lookup
+        raw: List[Optional[str]] = [None] * len(self._keys)
+        values: List[Any] = [None] * self._slot_count
+        row_count = 0
+        
+        for address, num, value in rows:
+            entry = lookup.get(address)
+            if entry is None:
+                continue
+            row_count += 1
+            first, by_num, bitmask = entry
+            # 没有指定num时，与原有逻辑一致，取该地址的第一行
+            if first is not None and raw[first] is None:
+                raw[first] = value
+            if by_num:
+                index = by_num.get(num or None)
+                if index is not None:
+                    raw[index] = value
+            if bitmask is not None:
+                slot, bits = bitmask
+                bit = bits.get(num)
+                if bit is not None:
+                    mask = values[slot] or 0
+                    values[slot] = mask | (1 << bit) if value == "1" else mask
+        
+        for slot, index, converter in self._fields:
+            if raw[index] is not None:
+                values[slot] = converter(raw[index])
+        return PhnixStatusSnapshot(self, raw, values, row_count)
+
+class PhnixStatusSnapshot:
+    """Decoded device status: raw registers and typed fields in fixed slots."""
+    
+    __slots__ = ("plan", "_raw", "_values", "_row_count")
+    
+    def __init__(
+        self,
+        plan: DecoderPlan,
+        raw: List[Optional[str]],
+        values: List[Any],
+        row_count: int,
+    ):
+        """Initialize the snapshot; use DecoderPlan.decode to build one."""
+        self.plan = plan
+        self._raw = raw
+        self._values = values
+        self._row_count = row_count
+    
+    def value(self, slot: Optional[int]) -> Any:
+        """Return the typed value of a field slot, or None if absent."""
+        if slot is None:
+            return None
+        return self._values[slot]
+    
+    def get(self, address: str, num: Optional[str] = None) -> Optional[str]:
+        """Return the raw dataValue for a register, or None if absent."""
+        index = self.plan.register_index(address, num)
+        if index is None:
+            return None
+        return self._raw[index]
+    
+    def __len__(self) -> int:
+        """Return the number of rows decoded into the snapshot."""
+        return self._row_count
+    
+    def as_rows(self) -> List[List[Optional[str]]]:
+        """Return the raw registers as [address, num, dataValue] lists for storage."""
+        rows = [
+            [address, num, value]
+            for (address, num), value in zip(self.plan.keys, self._raw)
+            if value is not None
+        ]
+        # 首行寄存器（num为None）放在前面，重新解码时不会被带num的行占用
+        rows.sort(key=lambda row: row[1] is not None)
+        return rows
+    
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Sequence[Optional[str]]], plan: DecoderPlan
+    ) -> "PhnixStatusSnapshot":
+        """Rebuild a snapshot from rows produced by as_rows."""
+        return plan.decode(rows)
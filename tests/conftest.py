@@ -0,0 +1,44 @@
+"""Test setup for the Phnix Heating client modules.
+
+The API client, decoder plan and metrics do not depend on Home Assistant,
+so they are tested without it: the integration package is registered
+without running its __init__ (which sets up config entries), and if Home
+Assistant is not installed, the one constant the shared const module
+imports from it is provided here.
+"""
+import enum
+import os
+import sys
+import types
+
+PACKAGE = "custom_components.phnix_heating"
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, "custom_components", "phnix_heating"
+)
+
+try:
+    import homeassistant.const  # noqa: F401
+except ImportError:
+    class Platform(str, enum.Enum):
+        """Platforms referenced by const.PLATFORMS."""
+
+        BINARY_SENSOR = "binary_sensor"
+        CLIMATE = "climate"
+        SENSOR = "sensor"
+
+    homeassistant = types.ModuleType("homeassistant")
+    homeassistant.__path__ = []
+    ha_const = types.ModuleType("homeassistant.const")
+    ha_const.Platform = Platform
+    homeassistant.const = ha_const
+    sys.modules["homeassistant"] = homeassistant
+    sys.modules["homeassistant.const"] = ha_const
+
+if PACKAGE not in sys.modules:
+    custom_components = types.ModuleType("custom_components")
+    custom_components.__path__ = [os.path.dirname(os.path.abspath(PACKAGE_DIR))]
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [os.path.abspath(PACKAGE_DIR)]
+    custom_components.phnix_heating = package
+    sys.modules.setdefault("custom_components", custom_components)
+    sys.modules[PACKAGE] = package
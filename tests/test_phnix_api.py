@@ -0,0 +1,306 @@
+"""Tests for the Phnix API client helpers, using an in-process fake session."""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+
+from custom_components.phnix_heating import phnix_api
+from custom_components.phnix_heating.const import (
+    BREAKER_FAILURE_THRESHOLD, DEFAULT_PROTOCOL_ID, HEDGE_MIN_SAMPLES, LOGIN_URL,
+    MIN_TOKEN_LIFETIME, STATUS_URL
+)
+from custom_components.phnix_heating.metrics import ENDPOINT_STATUS, PhnixAPIMetrics
+from custom_components.phnix_heating.snapshot import DecoderPlan
+from custom_components.phnix_heating.phnix_api import (
+    CircuitBreaker, PhnixAPI, PhnixAPIError, PhnixCircuitOpenError,
+    PhnixRequestOptions, _same_value
+)
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Replace the clock the client module reads."""
+    fake = FakeClock()
+    monkeypatch.setattr(
+        phnix_api, "time", SimpleNamespace(monotonic=fake.monotonic, time=time.time)
+    )
+    return fake
+
+class FakeResponse:
+    """Minimal aiohttp response serving a JSON body, optionally never finishing."""
+
+    def __init__(self, body: Any, stall: bool = False):
+        self.status = 200
+        self.raw_headers = ((b"Content-Type", b"application/json"),)
+        self._body = json.dumps(body).encode()
+        self.content_length = len(self._body)
+        self._stall = stall
+
+    async def read(self) -> bytes:
+        if self._stall:
+            await asyncio.sleep(3600)
+        return self._body
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+class FakeSession:
+    """Stand-in for the Phnix cloud that logs in and serves status rows."""
+
+    closed = False
+
+    def __init__(self, stall_status: bool = False):
+        self.stall_status = stall_status
+        self.urls: List[str] = []
+
+    def post(self, url: str, **kwargs: Any) -> FakeResponse:
+        self.urls.append(url)
+        if url.endswith("/login"):
+            return FakeResponse({"isReusltSuc": True, "objectResult": {"x-token": "token"}})
+        if url == STATUS_URL:
+            return FakeResponse(
+                {
+                    "isReusltSuc": True,
+                    "objectResult": {
+                        "dataList": [{"address": "T01", "num": "", "dataValue": "26"}]
+                    },
+                },
+                stall=self.stall_status,
+            )
+        return FakeResponse({"isReusltSuc": True})
+
+    async def close(self) -> None:
+        return None
+
+def make_api(session: FakeSession) -> PhnixAPI:
+    """Create a client whose device protocol ID is already cached."""
+    return PhnixAPI(
+        "user", "password", "DEVICE",
+        session=session,
+        protocol_cache={
+            "DEVICE": {"protocol_id": DEFAULT_PROTOCOL_ID, "discovered_at": time.time()}
+        },
+    )
+
+@pytest.mark.parametrize(
+    ("current", "value", "expected"),
+    [
+        (None, "1", False),
+        ("26", "26", True),
+        ("26.0", "26", True),
+        ("26", "27", False),
+        ("abc", "abc", True),
+        ("abc", "26", False),
+    ],
+)
+def test_same_value(current, value, expected):
+    """Numeric values compare as numbers, other text as strings."""
+    assert _same_value(current, value) is expected
+
+def test_breaker_opens_at_threshold(clock):
+    """Consecutive failures open the breaker; a success resets the count."""
+    breaker = CircuitBreaker(failure_threshold=3, base_backoff=30, max_backoff=900)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+    breaker.before_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.STATE_OPEN
+    with pytest.raises(PhnixCircuitOpenError):
+        breaker.before_request()
+
+def test_breaker_lets_one_probe_through(clock):
+    """After the backoff one probe is allowed; its success closes the breaker."""
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=30, max_backoff=900)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+    with pytest.raises(PhnixCircuitOpenError):
+        breaker.before_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+    breaker.before_request()
+
+def test_breaker_probe_failure_doubles_backoff(clock):
+    """A failed probe reopens the breaker with twice the backoff, up to the cap."""
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=30, max_backoff=100)
+    breaker.record_failure()
+    clock.now += 30
+    for backoff in (60, 100, 100):
+        breaker.before_request()
+        breaker.record_failure()
+        # 抖动后的等待时间在退避时间的一半到全部之间
+        clock.now += backoff / 2 - 0.01
+        assert breaker.state == CircuitBreaker.STATE_OPEN
+        clock.now += backoff / 2 + 0.01
+        assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+
+def test_breaker_release_probe(clock):
+    """A probe that ended without a result lets the next request probe."""
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=30, max_backoff=900)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_request()
+    breaker.release_probe()
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+
+def test_learn_token_lifetime(clock):
+    """An early expiry needs a second observation; a later one raises the estimate."""
+    api = PhnixAPI("user", "password", "DEVICE", session=FakeSession())
+
+    api._token_issued_at = clock.now - (MIN_TOKEN_LIFETIME - 1)
+    api._learn_token_lifetime()
+    assert api.token_lifetime is None
+
+    api._token_issued_at = clock.now - 1800
+    api._learn_token_lifetime()
+    assert api.token_lifetime is None
+    api._token_issued_at = clock.now - 3600
+    api._learn_token_lifetime()
+    assert api.token_lifetime == 3600
+
+    # 单次较早失效不会降低估计
+    api._token_issued_at = clock.now - 1200
+    api._learn_token_lifetime()
+    assert api.token_lifetime == 3600
+    api._token_issued_at = clock.now - 1500
+    api._learn_token_lifetime()
+    assert api.token_lifetime == 1500
+
+    api._token_issued_at = clock.now - 7200
+    api._learn_token_lifetime()
+    assert api.token_lifetime == 7200
+
+def test_token_lifetime_initial_estimate(clock):
+    """An expiry later than the initial estimate raises it at once."""
+    api = PhnixAPI("user", "password", "DEVICE", token_lifetime=600, session=FakeSession())
+    api._token_issued_at = clock.now - 900
+    api._learn_token_lifetime()
+    assert api.token_lifetime == 900
+
+def hedge_options() -> PhnixRequestOptions:
+    """Options whose status timeout caps the hedging delay at 50 ms."""
+    return PhnixRequestOptions(status_timeout=0.05, metrics=PhnixAPIMetrics())
+
+def test_hedged_fast_request_is_not_hedged():
+    """A request answering before the hedging delay runs once."""
+    api = PhnixAPI("user", "password", "DEVICE", session=FakeSession())
+    options = hedge_options()
+    calls = []
+
+    async def request() -> str:
+        calls.append(None)
+        return "fast"
+
+    assert asyncio.run(api._hedged(request, options)) == "fast"
+    assert len(calls) == 1
+    assert api.metrics.hedged_requests == 0
+
+def test_hedged_slow_request_returns_first_result():
+    """A slow first attempt is hedged; the faster result wins and the other is cancelled."""
+    api = PhnixAPI("user", "password", "DEVICE", session=FakeSession())
+    options = hedge_options()
+    attempts: List[asyncio.Future] = []
+
+    async def request() -> str:
+        attempts.append(asyncio.current_task())
+        if len(attempts) == 1:
+            await asyncio.sleep(3600)
+        return f"attempt {len(attempts)}"
+
+    async def run() -> str:
+        result = await api._hedged(request, options)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "attempt 2"
+    assert attempts[0].cancelled()
+    assert api.metrics.hedged_requests == 1
+    assert options.metrics.hedged_requests == 1
+
+def test_hedged_raises_when_both_attempts_fail():
+    """The last error is raised only once both attempts failed."""
+    api = PhnixAPI("user", "password", "DEVICE", session=FakeSession())
+    options = hedge_options()
+    attempts = []
+
+    async def request() -> str:
+        attempts.append(None)
+        number = len(attempts)
+        await asyncio.sleep(0.1 if number == 1 else 0.2)
+        raise PhnixAPIError(f"attempt {number}")
+
+    with pytest.raises(PhnixAPIError, match="attempt 2"):
+        asyncio.run(api._hedged(request, options))
+    assert len(attempts) == 2
+
+def test_hedge_delay_follows_latency_quantile():
+    """The hedging delay tracks observed latency, capped by the status timeout."""
+    api = PhnixAPI("user", "password", "DEVICE", session=FakeSession())
+    assert api._hedge_delay(1.0) == 1.0
+
+    api._status_latencies.extend([0.8] * HEDGE_MIN_SAMPLES)
+    assert api._hedge_delay(20) == 0.8
+    assert api._hedge_delay(0.5) == 0.5
+
+def test_get_device_status_decodes_rows():
+    """A status read through the fake session decodes rows and records metrics."""
+    session = FakeSession()
+    api = make_api(session)
+    options = PhnixRequestOptions(metrics=PhnixAPIMetrics())
+
+    async def run():
+        plan = DecoderPlan()
+        plan.add_register("T01")
+        snapshot = await api.get_device_status(plan, "DEVICE", options)
+        await api.close()
+        return snapshot
+
+    snapshot = asyncio.run(run())
+    assert snapshot.get("T01") == "26"
+    assert session.urls == [LOGIN_URL, STATUS_URL]
+    for metrics in (api.metrics, options.metrics):
+        assert metrics.endpoints[ENDPOINT_STATUS].requests == 1
+        assert metrics.endpoints[ENDPOINT_STATUS].failures == 0
+        assert metrics.last_successful_poll is not None
+
+def test_stalled_status_read_counts_as_failure():
+    """A request ended by the operation deadline counts for metrics and the breaker."""
+    session = FakeSession(stall_status=True)
+    api = make_api(session)
+    options = PhnixRequestOptions(status_timeout=0.05, metrics=PhnixAPIMetrics())
+
+    async def run() -> None:
+        await api.login()
+        for _ in range(BREAKER_FAILURE_THRESHOLD):
+            with pytest.raises(PhnixAPIError, match="超时"):
+                await api.get_device_status(device_code="DEVICE", options=options)
+        await api.close()
+
+    asyncio.run(run())
+    for metrics in (api.metrics, options.metrics):
+        assert metrics.endpoints[ENDPOINT_STATUS].failures == BREAKER_FAILURE_THRESHOLD
+    assert api.circuit_state == CircuitBreaker.STATE_OPEN
@@ -0,0 +1,84 @@
+"""Tests for the compiled status decoder plan."""
+from custom_components.phnix_heating.snapshot import (
+    DecoderPlan, PhnixStatusSnapshot, to_bool, to_number
+)
+
+def build_plan() -> DecoderPlan:
+    """Build a plan with plain, numbered, first-row and bitmask registers."""
+    plan = DecoderPlan()
+    plan.add_field("1001", converter=to_number)
+    plan.add_field("1002", "a", to_bool)
+    plan.add_register("1002")
+    plan.add_register("1003")
+    plan.add_bitmask("2000", {"0": 0, "1": 1, "2": 2})
+    return plan
+
+ROWS = [
+    ("9999", "", "ignored"),
+    ("1001", "", "21.5"),
+    ("1001", "", "99"),
+    ("1002", "b", "first"),
+    ("1002", "a", "1"),
+    ("2000", "0", "1"),
+    ("2000", "1", "0"),
+    ("2000", "2", "1"),
+    ("2000", "7", "1"),
+]
+
+def test_decode_reads_planned_registers_only():
+    """Rows outside the plan are skipped and the first row of an address wins."""
+    plan = build_plan()
+    snapshot = plan.decode(ROWS)
+
+    assert len(snapshot) == len(ROWS) - 1
+    assert snapshot.value(plan.slot("1001", converter=to_number)) == 21.5
+    assert snapshot.get("1001") == "21.5"
+    assert snapshot.value(plan.slot("1002", "a", to_bool)) is True
+    assert snapshot.get("1002") == "first"
+    assert snapshot.get("1002", "a") == "1"
+    assert snapshot.get("1003") is None
+    assert snapshot.get("9999") is None
+    assert plan.addresses == frozenset({"1001", "1002", "1003", "2000"})
+
+def test_decode_bitmask():
+    """Bitmask rows set their bit when on; unknown nums are ignored."""
+    plan = build_plan()
+    snapshot = plan.decode(ROWS)
+
+    assert snapshot.value(plan.bitmask_slot("2000")) == 0b101
+    assert snapshot.get("2000", "1") == "0"
+    assert plan.decode([("2000", "1", "0")]).value(plan.bitmask_slot("2000")) == 0
+    assert plan.decode([]).value(plan.bitmask_slot("2000")) is None
+
+def test_missing_slots():
+    """Fields the plan does not decode have no slot and read as None."""
+    plan = build_plan()
+    snapshot = plan.decode(ROWS)
+
+    assert plan.slot("1003", converter=to_number) is None
+    assert plan.bitmask_slot("1001") is None
+    assert snapshot.value(None) is None
+
+def test_rows_round_trip():
+    """A snapshot rebuilt from as_rows decodes to the same values."""
+    plan = build_plan()
+    snapshot = plan.decode(ROWS)
+    rows = snapshot.as_rows()
+    restored = PhnixStatusSnapshot.from_rows(rows, plan)
+
+    # 首行寄存器排在带num的行之前
+    assert rows.index(["1002", None, "first"]) < rows.index(["1002", "a", "1"])
+    assert restored.as_rows() == rows
+    for address, num in plan.keys:
+        assert restored.get(address, num) == snapshot.get(address, num)
+    assert restored.value(plan.slot("1001", converter=to_number)) == 21.5
+    assert restored.value(plan.slot("1002", "a", to_bool)) is True
+    assert restored.value(plan.bitmask_slot("2000")) == 0b101
+
+def test_plan_reuses_slots():
+    """Adding the same field or register twice returns the existing index."""
+    plan = DecoderPlan()
+
+    assert plan.add_field("1", converter=to_number) == plan.add_field("1", "", to_number)
+    assert plan.add_register("1") == plan.register_index("1")
+    assert plan.add_bitmask("2", {"0": 0}) == plan.add_bitmask("2", {"0": 0})